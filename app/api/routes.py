@@ -3,10 +3,16 @@ API Routes for the AI Agent application.
 Defines all HTTP endpoints for the FastAPI application.
 """
 
+import time
 import logging
-from fastapi import APIRouter, HTTPException, Depends
-from app.models.schemas import AskRequest, AskResponse, HealthResponse
+from datetime import datetime
+from typing import Optional, Tuple
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from app.models.schemas import AskRequest, AskResponse, HealthResponse, utc_now
 from app.services.agent_service import get_agent_service, AgentService
+from app.services.rag_service import get_rag_service, RAGService
+from app.services.session_service import get_session_service, SessionService
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -14,20 +20,51 @@ logger = logging.getLogger(__name__)
 # Create router
 router = APIRouter()
 
+# Health checks are polled frequently and only need second-level timestamps
+HEALTH_TIMESTAMP_TTL_SECONDS = 1.0
+_health_timestamp: Tuple[float, Optional[datetime]] = (0.0, None)
+
+
+def _cached_health_timestamp() -> datetime:
+    """Return a UTC timestamp that is refreshed at most once per TTL."""
+    global _health_timestamp
+    checked_at, timestamp = _health_timestamp
+    now = time.monotonic()
+    if timestamp is None or now - checked_at >= HEALTH_TIMESTAMP_TTL_SECONDS:
+        timestamp = utc_now()
+        _health_timestamp = (now, timestamp)
+    return timestamp
+
+
+async def wait_until_ready(request: Request) -> None:
+    """Wait for the startup warm-up of the service singletons to finish."""
+    ready = getattr(request.app.state, "ready", None)
+    if ready is not None:
+        await ready.wait()
+
 
 @router.get("/health", response_model=HealthResponse, tags=["Health"])
-async def health_check():
+async def health_check(request: Request):
     """
     Health check endpoint.
     Returns application status and version information.
+    Status is "warming" until the services have finished warming up.
     """
+    ready = getattr(request.app.state, "ready", None)
     return HealthResponse(
-        status="healthy",
-        version=settings.APP_VERSION
+        status="warming" if ready is not None and not ready.is_set() else "healthy",
+        version=settings.APP_VERSION,
+        timestamp=_cached_health_timestamp()
     )
 
 
-@router.post("/ask", response_model=AskResponse, tags=["Agent"])
+@router.post(
+    "/ask",
+    response_model=AskResponse,
+    response_class=ORJSONResponse,
+    tags=["Agent"],
+    dependencies=[Depends(wait_until_ready)]
+)
 async def ask(
     request: AskRequest,
     agent_service: AgentService = Depends(get_agent_service)
@@ -65,8 +102,38 @@ async def ask(
         )
 
 
-@router.post("/reindex", tags=["Admin"])
-async def reindex_documents():
+@router.post("/ask/stream", tags=["Agent"], dependencies=[Depends(wait_until_ready)])
+async def ask_stream(
+    request: AskRequest,
+    agent_service: AgentService = Depends(get_agent_service)
+):
+    """
+    Streaming variant of /ask.
+    
+    Returns a Server-Sent Events stream: a metadata event with the session ID,
+    query type and sources, then answer deltas, then a final "done" event,
+    or an "error" event if processing fails part-way.
+    
+    Args:
+        request: AskRequest containing the query and optional session_id
+        
+    Returns:
+        StreamingResponse of SSE frames
+    """
+    logger.info(f"Streaming query: {request.query[:100]}...")
+    return StreamingResponse(
+        agent_service.process_query_stream(
+            query=request.query,
+            session_id=request.session_id
+        ),
+        media_type="text/event-stream"
+    )
+
+
+@router.post("/reindex", tags=["Admin"], dependencies=[Depends(wait_until_ready)])
+async def reindex_documents(
+    rag_service: RAGService = Depends(get_rag_service)
+):
     """
     Trigger re-indexing of all documents.
     Use this after adding new documents to the documents directory.
@@ -75,11 +142,8 @@ async def reindex_documents():
         Number of chunks indexed
     """
     try:
-        from app.services.rag_service import get_rag_service
-        rag_service = get_rag_service()
-        
         # Re-index documents (Update/Upload existing documents)
-        num_chunks = rag_service.index_documents()
+        num_chunks = await rag_service.index_documents()
         
         return {"message": f"Successfully indexed {num_chunks} document chunks"}
         
@@ -92,7 +156,10 @@ async def reindex_documents():
 
 
 @router.delete("/session/{session_id}", tags=["Session"])
-async def clear_session(session_id: str):
+async def clear_session(
+    session_id: str,
+    session_service: SessionService = Depends(get_session_service)
+):
     """
     Clear a specific session's conversation history.
     
@@ -103,9 +170,6 @@ async def clear_session(session_id: str):
         Status message
     """
     try:
-        from app.services.session_service import get_session_service
-        session_service = get_session_service()
-        
         if session_service.clear_session(session_id):
             return {"message": f"Session {session_id} cleared successfully"}
         else:
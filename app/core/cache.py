@@ -0,0 +1,62 @@
+"""
+Caching utilities shared across services.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+
+class LRUCache:
+    """
+    Bounded least-recently-used cache with hit/miss counters.
+    With a ttl, entries also expire that many seconds after they were stored.
+    Not thread-safe; callers share it from a single event loop or hold a lock.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        """Initialize an empty cache holding at most maxsize entries."""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # Values are stored with their expiry time on the monotonic clock
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def _live_entry(self, key: Hashable) -> Optional[Tuple[float, Any]]:
+        """Return the entry for key, dropping it if it has expired."""
+        entry = self._data.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss."""
+        entry = self._live_entry(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store value under key, evicting the least recently used entry if full."""
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries and reset the counters."""
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._live_entry(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -5,7 +5,7 @@ Manages environment variables and application settings.
 
 import os
 from functools import lru_cache
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Optional
 
 
@@ -19,6 +19,7 @@ class Settings(BaseSettings):
     APP_NAME: str = "AI Agent RAG Backend"
     APP_VERSION: str = "1.0.0"
     DEBUG: bool = False
+    DEMO_MODE: bool = False
     
     # Azure OpenAI Configuration
     AZURE_OPENAI_API_KEY: str = ""
@@ -27,16 +28,28 @@ class Settings(BaseSettings):
     AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME: str = "text-embedding-ada-002"
     AZURE_OPENAI_API_VERSION: str = "2024-02-15-preview"
     
+    # Open-Source Model Configuration
+    USE_OPEN_SOURCE_MODELS: bool = False
+    OPEN_SOURCE_CHAT_MODEL: str = "microsoft/DialoGPT-medium"
+    OPEN_SOURCE_EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    
     # Azure AI Search Configuration
     AZURE_SEARCH_SERVICE_ENDPOINT: str = ""
     AZURE_SEARCH_ADMIN_KEY: str = ""
     AZURE_SEARCH_INDEX_NAME: str = "rag-index"
+    # HNSW graph parameters, applied when the index is created
+    HNSW_M: int = 10
+    HNSW_EF_CONSTRUCTION: int = 200
+    HNSW_EF_SEARCH: int = 100
     
     # RAG Configuration
     CHUNK_SIZE: int = 500
     CHUNK_OVERLAP: int = 50
     TOP_K_RESULTS: int = 3
     SIMILARITY_THRESHOLD: float = 0.7
+    EMBEDDING_CACHE_SIZE: int = 4096
+    SEARCH_CACHE_SIZE: int = 1024
+    SEARCH_CACHE_TTL_SECONDS: float = 300.0
     
     # Documents Configuration
     DOCUMENTS_PATH: str = "documents"
@@ -44,30 +57,30 @@ class Settings(BaseSettings):
     # Session Configuration
     MAX_SESSION_HISTORY: int = 10
     SESSION_TIMEOUT_MINUTES: int = 60
+    MAX_SESSIONS: int = 10000
 
     # Model Parameters
     TEMPERATURE: float = 0.7
     MAX_TOKENS: int = 1000
-    
-    model_config = {
-        "env_file": ".env",
-        "env_file_encoding": "utf-8",
-        "case_sensitive": True,
-        "extra": "ignore"
-    }
 
-# Clear cache if exists
-get_settings_cached = None
+    # Concurrency
+    THREADPOOL_TOKENS: int = 100
+    IO_THREADPOOL_SIZE: int = 32
+    
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        case_sensitive=True,
+        extra="ignore"
+    )
 
 
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
     """
     Returns settings instance.
     """
-    global get_settings_cached
-    if get_settings_cached is None:
-        get_settings_cached = Settings()
-    return get_settings_cached
+    return Settings()
 
 
 # Export settings instance for convenience
@@ -0,0 +1,37 @@
+"""
+Read-ahead helper for overlapping blocking I/O with async processing.
+"""
+
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Callable, Iterable, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+async def prefetch(
+    func: Callable[[T], R],
+    items: Iterable[T],
+    window: int = 8
+) -> AsyncIterator[Tuple[T, "asyncio.Future[R]"]]:
+    """
+    Run func(item) in worker threads, up to window items ahead of the consumer.
+    Yields (item, future) pairs in input order; awaiting the future returns
+    func's result or raises its exception.
+    """
+    items = iter(items)
+    pending = deque()
+
+    def submit() -> None:
+        for item in items:
+            pending.append((item, asyncio.ensure_future(asyncio.to_thread(func, item))))
+            return
+
+    for _ in range(window):
+        submit()
+
+    while pending:
+        item, future = pending.popleft()
+        submit()
+        yield item, future
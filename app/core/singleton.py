@@ -0,0 +1,31 @@
+"""
+Thread-safe lazy singletons for service getters.
+"""
+
+import threading
+from functools import lru_cache, wraps
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+
+def singleton(factory: Callable[[], T]) -> Callable[[], T]:
+    """
+    Cache the result of a zero-argument factory, like lru_cache(maxsize=1).
+    Unlike lru_cache, concurrent first calls (e.g. sync dependencies running in
+    FastAPI's threadpool) construct the instance only once. Exposes cache_clear().
+    """
+    cached = lru_cache(maxsize=1)(factory)
+    lock = threading.Lock()
+
+    @wraps(factory)
+    def get() -> T:
+        if cached.cache_info().currsize:
+            return cached()
+        # Double-checked: only the first caller runs the factory
+        with lock:
+            return cached()
+
+    get.cache_clear = cached.cache_clear
+    get.cache_info = cached.cache_info
+    return get
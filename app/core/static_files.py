@@ -0,0 +1,187 @@
+"""
+Static file serving with in-memory contents and HTTP caching headers.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Receive, Scope, Send
+
+from app.core.cache import LRUCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Files named with a content hash (e.g. app.3f2a9c1b.js) never change in place
+_HASHED_NAME_RE = re.compile(r"\.[0-9a-f]{8,}\.\w+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=60, must-revalidate"
+
+# Response bodies and headers per encoding, keyed by (path, mtime, size) so an
+# edited file is read again. Filled from worker threads, hence the lock
+FILE_CACHE_SIZE = 64
+_file_cache = LRUCache(FILE_CACHE_SIZE)
+_file_cache_lock = Lock()
+
+Variants = Dict[str, Tuple[bytes, Dict[str, str]]]
+
+
+def cache_control_for(path: str) -> str:
+    """Return the Cache-Control value for a static file path."""
+    if _HASHED_NAME_RE.search(path):
+        return IMMUTABLE_CACHE_CONTROL
+    return REVALIDATE_CACHE_CONTROL
+
+
+def _is_compressible(media_type: str) -> bool:
+    """Return whether a media type is text-like and worth compressing."""
+    return media_type.startswith("text/") or media_type in (
+        "application/javascript", "application/json", "image/svg+xml"
+    )
+
+
+def _accepted_encodings(accept_encoding: str) -> set:
+    """Parse an Accept-Encoding header into the set of encodings not refused with q=0."""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _cached_file(path: str, mtime: float, size: int) -> Optional[Variants]:
+    """Return the cached variants of a file, or None if it must be loaded."""
+    with _file_cache_lock:
+        return _file_cache.get((path, mtime, size))
+
+
+def _load_file(path: str, mtime: float, size: int) -> Variants:
+    """Return the variants of a file, reading it on a cache miss. Blocking."""
+    variants = _cached_file(path, mtime, size)
+    if variants is None:
+        variants = _read_file(path, mtime, size)
+        with _file_cache_lock:
+            _file_cache.put((path, mtime, size), variants)
+    return variants
+
+
+def _read_file(path: str, mtime: float, size: int) -> Variants:
+    """
+    Read a file and build its response body and headers for each content encoding.
+    Text files are compressed once here (gzip, and brotli when installed) rather than per request.
+    """
+    with open(path, "rb") as f:
+        content = f.read()
+    media_type = mimetypes.guess_type(path)[0] or "text/plain"
+    # Same validators as starlette's FileResponse
+    etag = hashlib.md5(f"{mtime}-{size}".encode(), usedforsecurity=False).hexdigest()
+    headers = {
+        "content-type": media_type,
+        "cache-control": cache_control_for(path),
+        "etag": f'"{etag}"',
+        "last-modified": formatdate(mtime, usegmt=True),
+    }
+    variants = {"identity": (content, headers)}
+    if not _is_compressible(media_type):
+        return variants
+
+    headers["vary"] = "Accept-Encoding"
+    compressed = {"gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressed["br"] = brotli.compress(content, quality=11)
+    for encoding, body in compressed.items():
+        if len(body) < len(content):
+            # Each encoding is a distinct representation, so it gets its own ETag
+            variants[encoding] = (body, {
+                **headers,
+                "content-encoding": encoding,
+                "etag": f'"{etag}-{encoding}"',
+            })
+    return variants
+
+
+class _DeferredFileResponse(Response):
+    """Response for an uncached file, which is read and compressed off the event loop when sent."""
+
+    def __init__(self, files: "CachedStaticFiles", key: Tuple[str, float, int], status_code: int):
+        super().__init__(status_code=status_code)
+        self._files = files
+        self._key = key
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        variants = await asyncio.to_thread(_load_file, *self._key)
+        response = self._files.variant_response(variants, scope, self.status_code)
+        response.background = self.background
+        await response(scope, receive, send)
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles that serves file contents from memory and sets Cache-Control.
+    Text files are sent precompressed when the client accepts it.
+    Conditional requests matching the ETag or Last-Modified get a 304.
+    Files not yet in memory are loaded in a worker thread, never on the event loop.
+    """
+
+    def preload(self) -> int:
+        """
+        Read and compress every served file ahead of the first request.
+        Blocking; run it off the event loop. Returns the number of files loaded.
+        """
+        loaded = 0
+        for directory in self.all_directories:
+            for root, _, names in os.walk(directory):
+                for name in names:
+                    # Resolved the way StaticFiles.lookup_path resolves request paths
+                    path = os.path.realpath(os.path.join(root, name))
+                    stat_result = os.stat(path)
+                    _load_file(path, stat_result.st_mtime, stat_result.st_size)
+                    loaded += 1
+        return loaded
+
+    def file_response(
+        self,
+        full_path: "os.PathLike[str] | str",
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        key = (str(full_path), stat_result.st_mtime, stat_result.st_size)
+        variants = _cached_file(*key)
+        if variants is None:
+            return _DeferredFileResponse(self, key, status_code)
+        return self.variant_response(variants, scope, status_code)
+
+    def variant_response(self, variants: Variants, scope: Scope, status_code: int = 200) -> Response:
+        """Pick the encoding the client accepts and answer 304 if its copy is current."""
+        request_headers = Headers(scope=scope)
+        content, headers = variants["identity"]
+        if len(variants) > 1:
+            accepted = _accepted_encodings(request_headers.get("accept-encoding", ""))
+            for encoding in ("br", "gzip"):
+                if encoding in variants and encoding in accepted:
+                    content, headers = variants[encoding]
+                    break
+        response_headers = Headers(headers=headers)
+        if self.is_not_modified(response_headers, request_headers):
+            return NotModifiedResponse(response_headers)
+        return Response(content, status_code=status_code, headers=headers)
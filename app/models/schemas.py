@@ -3,12 +3,18 @@ Pydantic schemas for API request and response models.
 Defines the data structures used across the application.
 """
 
+from collections import deque
 from pydantic import BaseModel, Field
-from typing import List, Optional
-from datetime import datetime
+from typing import Deque, List, Optional
+from datetime import datetime, timezone
 from enum import Enum
 
 
+def utc_now() -> datetime:
+    """Return the current time as a timezone-aware UTC datetime."""
+    return datetime.now(timezone.utc)
+
+
 class QueryType(str, Enum):
     """Enum for query classification types."""
     DIRECT = "direct"  # Can be answered directly by LLM
@@ -60,7 +66,7 @@ class AskResponse(BaseModel):
     query_type: QueryType = Field(..., description="Type of query processing used")
     session_id: str = Field(..., description="Session ID for this conversation")
     timestamp: datetime = Field(
-        default_factory=datetime.utcnow,
+        default_factory=utc_now,
         description="Response timestamp"
     )
 
@@ -83,7 +89,7 @@ class HealthResponse(BaseModel):
     status: str = Field(..., description="Application health status")
     version: str = Field(..., description="Application version")
     timestamp: datetime = Field(
-        default_factory=datetime.utcnow,
+        default_factory=utc_now,
         description="Health check timestamp"
     )
 
@@ -95,7 +101,7 @@ class SessionMessage(BaseModel):
     role: str = Field(..., description="Message role: 'user' or 'assistant'")
     content: str = Field(..., description="Message content")
     timestamp: datetime = Field(
-        default_factory=datetime.utcnow,
+        default_factory=utc_now,
         description="Message timestamp"
     )
 
@@ -105,15 +111,15 @@ class SessionData(BaseModel):
     Schema for session data storage.
     """
     session_id: str = Field(..., description="Unique session identifier")
-    messages: List[SessionMessage] = Field(
-        default_factory=list,
-        description="Conversation history"
+    messages: Deque[SessionMessage] = Field(
+        default_factory=deque,
+        description="Conversation history, bounded when created with a maxlen"
     )
     created_at: datetime = Field(
-        default_factory=datetime.utcnow,
+        default_factory=utc_now,
         description="Session creation timestamp"
     )
     last_accessed: datetime = Field(
-        default_factory=datetime.utcnow,
+        default_factory=utc_now,
         description="Last access timestamp"
     )
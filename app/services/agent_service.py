@@ -4,15 +4,17 @@ Core agent logic that decides between direct LLM response and RAG-based retrieva
 Implements tool calling and query classification.
 """
 
-import json
+import re
+import string
 import logging
-from typing import Dict, List, Optional, Tuple
-from app.core.config import settings
-from app.models.schemas import QueryType, AskResponse, DocumentSource
+from typing import AsyncIterator, List, Optional, Tuple
+import orjson
+from app.core.cache import LRUCache
+from app.core.singleton import singleton
+from app.models.schemas import QueryType, AskResponse, utc_now
 from app.services.azure_openai_service import get_azure_openai_service
 from app.services.rag_service import get_rag_service
 from app.services.session_service import get_session_service
-from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
@@ -79,6 +81,70 @@ INSTRUCTIONS:
 USER QUESTION: {question}"""
 
 
+# Static system messages, shared across requests and never mutated
+CLASSIFICATION_SYSTEM_MESSAGE = {"role": "system", "content": CLASSIFICATION_SYSTEM_PROMPT}
+DIRECT_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "You are a helpful AI assistant. Provide clear, accurate, and helpful responses."
+}
+
+
+NO_CONTEXT_ANSWER = (
+    "I couldn't find relevant information in the documents to answer your question. "
+    "Could you please rephrase or ask about a different topic?"
+)
+
+
+# LRU cache of classification decisions for history-free queries
+CLASSIFICATION_CACHE_SIZE = 4096
+_classification_cache = LRUCache(CLASSIFICATION_CACHE_SIZE)
+
+
+# Cheap pre-filters that settle obvious queries without a classification call.
+# Both run on the normalized query, which has no punctuation. Greetings must be the
+# whole message, and keywords are terms that only make sense about the company.
+_GREETING_RE = re.compile(r"^(hi|hello|hey|thanks|thank you|bye)$")
+_COMPANY_KEYWORDS = frozenset({
+    "pto", "401k", "cloudsync", "handbook", "onboarding", "reimbursement", "payroll"
+})
+
+
+# Tool arguments above this size are scanned for "query" before full JSON parsing
+LARGE_TOOL_ARGUMENTS_LENGTH = 1024
+_QUERY_ARG_RE = re.compile(r'"query"\s*:\s*("(?:[^"\\]|\\.)*")')
+
+
+def _extract_search_query(arguments: str, default: str) -> str:
+    """Extract the "query" argument of a search_documents tool call."""
+    if len(arguments) > LARGE_TOOL_ARGUMENTS_LENGTH:
+        match = _QUERY_ARG_RE.search(arguments)
+        if match:
+            # The captured group is a JSON string literal, decode it for escapes
+            return orjson.loads(match.group(1))
+    return orjson.loads(arguments).get("query", default)
+
+
+def _sse_frame(payload: dict) -> str:
+    """Encode a payload as a Server-Sent Events data frame."""
+    return f"data: {orjson.dumps(payload).decode()}\n\n"
+
+
+# Query normalization tables, built once at import
+_PUNCTUATION_TABLE = str.maketrans("", "", string.punctuation)
+_WHITESPACE_RE = re.compile(r"\s+")
+CLASSIFICATION_CACHE_KEY_LENGTH = 256
+
+
+def _normalize_query(query: str) -> str:
+    """
+    Normalize a query for keyword matching and cache keying.
+    
+    Lowercases, strips punctuation and collapses whitespace. This is lossy,
+    so it is never used as LLM input.
+    """
+    return _WHITESPACE_RE.sub(" ", query.translate(_PUNCTUATION_TABLE).lower()).strip()
+
+
 class AgentService:
     """
     AI Agent service that orchestrates query processing.
@@ -92,7 +158,7 @@ class AgentService:
         self.session_service = get_session_service()
         logger.info("Agent Service initialized")
 
-    def _classify_and_process_query(
+    async def _classify_and_process_query(
         self, 
         query: str, 
         conversation_history: List[dict]
@@ -107,17 +173,31 @@ class AgentService:
         Returns:
             Tuple of (query_type, search_query if RAG needed)
         """
-        messages = [
-            {"role": "system", "content": CLASSIFICATION_SYSTEM_PROMPT}
-        ]
+        normalized_query = _normalize_query(query)
+        if not _COMPANY_KEYWORDS.isdisjoint(normalized_query.split(" ")):
+            logger.info("Query matches company keywords, using RAG")
+            return QueryType.RAG, query
+        if _GREETING_RE.match(normalized_query):
+            logger.info("Query is a greeting, answering directly")
+            return QueryType.DIRECT, None
+        
+        # Decisions only depend on the query when there is no history
+        cache_key = None if conversation_history else normalized_query[:CLASSIFICATION_CACHE_KEY_LENGTH]
+        cached = _classification_cache.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            logger.info("Using cached query classification")
+            return cached
         
         # Add conversation history for context
-        messages.extend(conversation_history[-6:])  # Last 3 exchanges
-        messages.append({"role": "user", "content": query})
+        messages = [
+            CLASSIFICATION_SYSTEM_MESSAGE,
+            *conversation_history,
+            {"role": "user", "content": query}
+        ]
         
         try:
             # Call LLM with tools to let it decide
-            response = self.openai_service.client.chat.completions.create(
+            response = await self.openai_service.client.chat.completions.create(
                 model=self.openai_service.chat_deployment,
                 messages=messages,
                 tools=AGENT_TOOLS,
@@ -128,24 +208,79 @@ class AgentService:
             message = response.choices[0].message
             
             # Check if the model wants to use a tool
-            if message.tool_calls:
-                for tool_call in message.tool_calls:
-                    if tool_call.function.name == "search_documents":
-                        args = json.loads(tool_call.function.arguments)
-                        search_query = args.get("query", query)
-                        logger.info(f"Agent decided to use RAG with query: {search_query}")
-                        return QueryType.RAG, search_query
-            
-            # No tool call - direct response
-            logger.info("Agent decided to answer directly")
-            return QueryType.DIRECT, None
+            tool_call = next(
+                (tc for tc in message.tool_calls or () if tc.function.name == "search_documents"),
+                None
+            )
+            if tool_call is not None:
+                result = (QueryType.RAG, _extract_search_query(tool_call.function.arguments, query))
+            else:
+                # No tool call - direct response
+                result = (QueryType.DIRECT, None)
             
         except Exception as e:
             logger.error(f"Error in query classification: {e}")
             # Default to RAG on error to be safe
             return QueryType.RAG, query
+        
+        if result[0] == QueryType.RAG:
+            logger.info(f"Agent decided to use RAG with query: {result[1]}")
+        else:
+            logger.info("Agent decided to answer directly")
+        
+        if cache_key is not None:
+            _classification_cache.put(cache_key, result)
+        
+        return result
+
+    def _build_direct_messages(
+        self, 
+        query: str, 
+        conversation_history: List[dict]
+    ) -> List[dict]:
+        """
+        Build the chat messages for a direct LLM response.
+        
+        Args:
+            query: User query
+            conversation_history: Previous conversation messages
+            
+        Returns:
+            List of message dictionaries
+        """
+        return [
+            DIRECT_SYSTEM_MESSAGE,
+            *conversation_history,
+            {"role": "user", "content": query}
+        ]
+
+    def _build_rag_messages(
+        self, 
+        query: str, 
+        context: str,
+        conversation_history: List[dict]
+    ) -> List[dict]:
+        """
+        Build the chat messages for a context-grounded RAG response.
+        
+        Args:
+            query: Original user query
+            context: Context retrieved for the query
+            conversation_history: Previous conversation messages
+            
+        Returns:
+            List of message dictionaries
+        """
+        prompt = RAG_RESPONSE_PROMPT.format_map({"context": context, "question": query})
+        
+        # Add some history for continuity
+        return [
+            {"role": "system", "content": prompt},
+            *conversation_history[-4:],
+            {"role": "user", "content": query}
+        ]
 
-    def _generate_direct_response(
+    async def _generate_direct_response(
         self, 
         query: str, 
         conversation_history: List[dict]
@@ -160,18 +295,14 @@ class AgentService:
         Returns:
             Generated response
         """
-        messages = [
-            {"role": "system", "content": "You are a helpful AI assistant. Provide clear, accurate, and helpful responses."}
-        ]
-        messages.extend(conversation_history[-6:])
-        messages.append({"role": "user", "content": query})
-        
-        return self.openai_service.get_chat_completion(messages)
+        messages = self._build_direct_messages(query, conversation_history)
+        return await self.openai_service.get_chat_completion(messages)
 
-    def _generate_rag_response(
+    async def _generate_rag_response(
         self, 
         query: str, 
-        search_query: str,
+        context: str,
+        sources: List[str],
         conversation_history: List[dict]
     ) -> Tuple[str, List[str]]:
         """
@@ -179,33 +310,50 @@ class AgentService:
         
         Args:
             query: Original user query
-            search_query: Query for document search
+            context: Context already retrieved for the query
+            sources: Source documents of the retrieved context
             conversation_history: Previous conversation messages
             
         Returns:
             Tuple of (response, source_list)
         """
-        # Retrieve relevant context
-        context, sources = self.rag_service.get_context_for_query(search_query)
-        
         if not context:
             # No relevant documents found
-            return (
-                "I couldn't find relevant information in the documents to answer your question. "
-                "Could you please rephrase or ask about a different topic?",
-                []
-            )
+            return NO_CONTEXT_ANSWER, []
         
         # Generate response with context
-        prompt = RAG_RESPONSE_PROMPT.format(context=context, question=query)
+        messages = self._build_rag_messages(query, context, conversation_history)
+        response = await self.openai_service.get_chat_completion(messages, temperature=0.5)
+        return response, sources
+
+    async def _route_query(
+        self, 
+        query: str, 
+        conversation_history: List[dict]
+    ) -> Tuple[QueryType, str, List[str]]:
+        """
+        Classify a query and retrieve its context when RAG is needed.
         
-        messages = [{"role": "system", "content": prompt}]
-        # Add some history for continuity
-        messages.extend(conversation_history[-4:])
-        messages.append({"role": "user", "content": query})
+        Args:
+            query: User query
+            conversation_history: Previous conversation messages
+            
+        Returns:
+            Tuple of (query_type, context, source_list)
+        """
+        # Classify query and determine processing method
+        query_type, search_query = await self._classify_and_process_query(
+            query, 
+            conversation_history
+        )
         
-        response = self.openai_service.get_chat_completion(messages, temperature=0.5)
-        return response, sources
+        if query_type == QueryType.DIRECT:
+            return query_type, "", []
+        
+        # Retrieve with the classifier's search query. The LLM tool call nearly always
+        # rephrases the question, so retrieval can't usefully start before it returns
+        context, sources = await self.rag_service.get_context_for_query(search_query or query)
+        return query_type, context, sources
 
     async def process_query(
         self, 
@@ -225,43 +373,101 @@ class AgentService:
         # Get or create session
         session_id = self.session_service.get_or_create_session(session_id)
         
-        # Get conversation history
-        conversation_history = self.session_service.get_conversation_history(session_id)
+        # Get the recent conversation history (last 3 exchanges)
+        conversation_history = self.session_service.get_recent(session_id, 6)
         
-        # Classify query and determine processing method
-        query_type, search_query = self._classify_and_process_query(
-            query, 
-            conversation_history
-        )
+        query_type, context, sources = await self._route_query(query, conversation_history)
         
         # Process based on classification
         if query_type == QueryType.DIRECT:
-            answer = self._generate_direct_response(query, conversation_history)
-            sources = []
+            answer = await self._generate_direct_response(query, conversation_history)
         else:
-            answer, sources = self._generate_rag_response(
+            answer, sources = await self._generate_rag_response(
                 query, 
-                search_query or query,
+                context,
+                sources,
                 conversation_history
             )
         
-        # Update session history
-        self.session_service.add_message(session_id, "user", query)
-        self.session_service.add_message(session_id, "assistant", answer)
+        # Update session history, stamping everything with one timestamp
+        now = utc_now()
+        self.session_service.add_message(session_id, "user", query, now)
+        self.session_service.add_message(session_id, "assistant", answer, now)
         
-        return AskResponse(
+        # Fields are produced by the service itself, so skip re-validation
+        return AskResponse.model_construct(
             answer=answer,
             sources=sources,
             query_type=query_type,
             session_id=session_id,
-            timestamp=datetime.utcnow()
+            timestamp=now
         )
 
-
-# Singleton instance
-_agent_service: Optional[AgentService] = None
+    async def process_query_stream(
+        self, 
+        query: str, 
+        session_id: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Process a user query and stream the answer as Server-Sent Events.
+        
+        The first event carries the session ID, query type and sources,
+        followed by one event per answer delta and a final "done" event.
+        A failure part-way through ends the stream with an "error" event instead.
+        
+        Args:
+            query: User's question
+            session_id: Optional session identifier
+            
+        Yields:
+            SSE frames
+        """
+        session_id = self.session_service.get_or_create_session(session_id)
+        conversation_history = self.session_service.get_recent(session_id, 6)
+        answer_parts = []
+        
+        try:
+            query_type, context, sources = await self._route_query(query, conversation_history)
+            
+            yield _sse_frame({
+                "type": "metadata",
+                "session_id": session_id,
+                "query_type": query_type.value,
+                "sources": sources if context else []
+            })
+            
+            if query_type == QueryType.DIRECT:
+                messages = self._build_direct_messages(query, conversation_history)
+                deltas = self.openai_service.stream_chat_completion(messages)
+            elif context:
+                messages = self._build_rag_messages(query, context, conversation_history)
+                deltas = self.openai_service.stream_chat_completion(messages, temperature=0.5)
+            else:
+                deltas = None
+                answer_parts.append(NO_CONTEXT_ANSWER)
+                yield _sse_frame({"type": "delta", "content": NO_CONTEXT_ANSWER})
+            
+            if deltas is not None:
+                async for delta in deltas:
+                    if delta:
+                        answer_parts.append(delta)
+                        yield _sse_frame({"type": "delta", "content": delta})
+        except Exception as e:
+            # The response has already started, so report the failure in-band
+            logger.error(f"Error streaming query: {e}")
+            yield _sse_frame({"type": "error", "message": f"Error processing query: {str(e)}"})
+            return
+        finally:
+            # Keep the exchange, with whatever part of the answer was sent, even on
+            # errors or client disconnects
+            now = utc_now()
+            self.session_service.add_message(session_id, "user", query, now)
+            self.session_service.add_message(session_id, "assistant", "".join(answer_parts), now)
+        
+        yield _sse_frame({"type": "done"})
 
 
+@singleton
 def get_agent_service() -> AgentService:
     """
     Get or create the agent service singleton.
@@ -269,7 +475,4 @@ def get_agent_service() -> AgentService:
     Returns:
         AgentService instance
     """
-    global _agent_service
-    if _agent_service is None:
-        _agent_service = AgentService()
-    return _agent_service
+    return AgentService()
@@ -3,12 +3,21 @@ Azure OpenAI Service module.
 Handles all interactions with Azure OpenAI for chat completions and embeddings.
 """
 
+import asyncio
 import logging
-from typing import List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Set
+from app.core.cache import LRUCache
 from app.core.config import settings
+from app.core.singleton import singleton
 
 logger = logging.getLogger(__name__)
 
+# Single-embedding requests arriving within this window share one API call
+EMBEDDING_COALESCE_WINDOW = 0.005
+EMBEDDING_COALESCE_MAX = 16
+# Embedding batches in flight at once across all callers, to stay under rate limits
+EMBEDDING_MAX_CONCURRENT_BATCHES = 4
+
 
 class AzureOpenAIService:
     """
@@ -17,18 +26,32 @@ class AzureOpenAIService:
     """
     
     def __init__(self):
-        """Initialize the Azure OpenAI client."""
-        from openai import AzureOpenAI
-        self.client = AzureOpenAI(
+        """Initialize the async Azure OpenAI client."""
+        import httpx
+        from openai import AsyncAzureOpenAI
+        # Long-lived HTTP/2 pool so concurrent requests reuse TLS connections
+        self._http = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+            timeout=httpx.Timeout(30.0, connect=5.0)
+        )
+        self.client = AsyncAzureOpenAI(
             api_key=settings.AZURE_OPENAI_API_KEY,
             api_version=settings.AZURE_OPENAI_API_VERSION,
-            azure_endpoint=settings.AZURE_OPENAI_ENDPOINT
+            azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
+            http_client=self._http
         )
         self.chat_deployment = settings.AZURE_OPENAI_DEPLOYMENT_NAME
         self.embedding_deployment = settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME
+        self._embedding_cache = LRUCache(settings.EMBEDDING_CACHE_SIZE)
+        self._embedding_slots = asyncio.Semaphore(EMBEDDING_MAX_CONCURRENT_BATCHES)
+        self._pending_embeddings: Dict[str, asyncio.Future] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        # Strong references to immediate flushes, which the event loop only holds weakly
+        self._flush_tasks: Set[asyncio.Task] = set()
         logger.info("Azure OpenAI Service initialized successfully")
 
-    def get_chat_completion(
+    async def get_chat_completion(
         self,
         messages: List[dict],
         temperature: float = 0.7,
@@ -46,7 +69,7 @@ class AzureOpenAIService:
             Generated response text
         """
         try:
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model=self.chat_deployment,
                 messages=messages,
                 temperature=temperature,
@@ -57,9 +80,44 @@ class AzureOpenAIService:
             logger.error(f"Error generating chat completion: {e}")
             raise
 
-    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+    async def stream_chat_completion(
+        self,
+        messages: List[dict],
+        temperature: float = 0.7,
+        max_tokens: int = 1000
+    ) -> AsyncIterator[str]:
+        """
+        Stream a chat completion using Azure OpenAI.
+        
+        Args:
+            messages: List of message dictionaries with 'role' and 'content'
+            temperature: Sampling temperature (0-2)
+            max_tokens: Maximum tokens in response
+            
+        Yields:
+            Generated text deltas as they arrive
+        """
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.chat_deployment,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            async for chunk in response:
+                # Azure sends a leading chunk without choices for content filtering
+                if chunk.choices:
+                    yield chunk.choices[0].delta.content or ""
+        except Exception as e:
+            logger.error(f"Error streaming chat completion: {e}")
+            raise
+
+    async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
         """
         Generate embeddings for a list of texts.
+        Cached and duplicate texts are not re-sent; remaining batches are sent concurrently,
+        at most EMBEDDING_MAX_CONCURRENT_BATCHES at a time.
         
         Args:
             texts: List of text strings to embed
@@ -68,24 +126,45 @@ class AzureOpenAIService:
             List of embedding vectors
         """
         try:
-            embeddings = []
-            # Process in batches to avoid API limits
-            batch_size = 16
-            for i in range(0, len(texts), batch_size):
-                batch = texts[i:i + batch_size]
-                response = self.client.embeddings.create(
-                    model=self.embedding_deployment,
-                    input=batch
-                )
-                embeddings.extend([data.embedding for data in response.data])
-            return embeddings
+            # Look up each distinct text once, in first-seen order
+            by_text = {}
+            misses = []
+            for text in dict.fromkeys(texts):
+                embedding = self._embedding_cache.get(text)
+                if embedding is None:
+                    misses.append(text)
+                else:
+                    by_text[text] = embedding
+            
+            if misses:
+                # Process in batches to avoid API limits
+                batch_size = 16
+                responses = await asyncio.gather(*(
+                    self._embed_batch(misses[i:i + batch_size])
+                    for i in range(0, len(misses), batch_size)
+                ))
+                embeddings = (data.embedding for response in responses for data in response.data)
+                for text, embedding in zip(misses, embeddings):
+                    by_text[text] = embedding
+                    self._embedding_cache.put(text, embedding)
+            
+            return [by_text[text] for text in texts]
         except Exception as e:
             logger.error(f"Error generating embeddings: {e}")
             raise
 
-    def get_single_embedding(self, text: str) -> List[float]:
+    async def _embed_batch(self, texts: List[str]):
+        """Send one embeddings request once a concurrency slot is free."""
+        async with self._embedding_slots:
+            return await self.client.embeddings.create(
+                model=self.embedding_deployment,
+                input=texts
+            )
+
+    async def get_single_embedding(self, text: str) -> List[float]:
         """
         Generate embedding for a single text.
+        Concurrent uncached requests are coalesced into one batched API call.
         
         Args:
             text: Text string to embed
@@ -93,14 +172,47 @@ class AzureOpenAIService:
         Returns:
             Embedding vector
         """
-        embeddings = self.get_embeddings([text])
-        return embeddings[0]
-
+        if text in self._embedding_cache:
+            embeddings = await self.get_embeddings([text])
+            return embeddings[0]
+        
+        future = self._pending_embeddings.get(text)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending_embeddings[text] = future
+            if len(self._pending_embeddings) >= EMBEDDING_COALESCE_MAX:
+                flush_task = asyncio.create_task(self._flush_pending_embeddings())
+                self._flush_tasks.add(flush_task)
+                flush_task.add_done_callback(self._flush_tasks.discard)
+            elif self._flush_task is None:
+                self._flush_task = asyncio.create_task(
+                    self._flush_pending_embeddings(EMBEDDING_COALESCE_WINDOW)
+                )
+        # Shielded so a cancelled caller does not cancel the result for others
+        return await asyncio.shield(future)
 
-# Singleton instance
-_azure_openai_service = None
+    async def _flush_pending_embeddings(self, delay: float = 0.0) -> None:
+        """Embed every pending single-embedding request in one batch."""
+        if delay:
+            await asyncio.sleep(delay)
+            self._flush_task = None
+        pending, self._pending_embeddings = self._pending_embeddings, {}
+        if not pending:
+            return
+        
+        try:
+            embeddings = await self.get_embeddings(list(pending))
+        except Exception as e:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, embedding in zip(pending.values(), embeddings):
+            if not future.done():
+                future.set_result(embedding)
 
 
+@singleton
 def get_azure_openai_service():
     """
     Get or create the LLM service singleton.
@@ -109,10 +221,6 @@ def get_azure_openai_service():
     Returns:
         AzureOpenAIService instance
     """
-    global _azure_openai_service
-
-    if _azure_openai_service is None:
-        _azure_openai_service = AzureOpenAIService()
-        logger.info("Using Azure OpenAI Service")
-
-    return _azure_openai_service
+    service = AzureOpenAIService()
+    logger.info("Using Azure OpenAI Service")
+    return service
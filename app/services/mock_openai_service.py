@@ -3,10 +3,20 @@ Mock Azure OpenAI Service for Demo Mode.
 Provides simulated responses without making actual API calls.
 """
 
+import re
 import logging
 import random
 import hashlib
-from typing import List, Optional
+import numpy as np
+import orjson
+from functools import lru_cache
+from typing import AsyncIterator, List, Optional, Tuple
+from app.core.singleton import singleton
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None
 
 logger = logging.getLogger(__name__)
 
@@ -237,10 +247,98 @@ GENERAL_RESPONSES = [
     "I'd be glad to help with that. ",
 ]
 
+# Keywords that route a query to RAG
+RAG_KEYWORDS = [
+    "policy", "policies", "remote", "work", "pto", "vacation", 
+    "leave", "401k", "retirement", "benefits", "cloudsync", 
+    "product", "code review", "password", "reset", "hr", 
+    "company", "documentation", "technical", "guidelines"
+]
+
+# Demo response routing: keyword -> DEMO_RESPONSES key. When a query matches
+# several buckets, the one listed first wins, like an if/elif cascade.
+DEMO_KEYWORDS = {
+    "remote": "remote work", "work from home": "remote work",
+    "pto": "pto", "vacation": "pto", "time off": "pto", "days": "pto",
+    "401k": "401k", "retirement": "401k", "matching": "401k",
+    "cloudsync": "cloudsync", "product": "cloudsync", "feature": "cloudsync",
+    "code review": "code review", "review": "code review", "pr": "code review",
+    "password": "password", "reset": "password",
+}
+# Short keywords that only match as whole words
+DEMO_WHOLE_WORDS = {"days", "review", "pr"}
+DEMO_BUCKETS = list(dict.fromkeys(DEMO_KEYWORDS.values()))
+DEMO_BUCKET_RANKS = {bucket: rank for rank, bucket in enumerate(DEMO_BUCKETS)}
+
+# One router for both decisions: keyword -> (routes to RAG, demo bucket or None).
+# A keyword routes to RAG if any RAG keyword occurs inside it.
+ROUTE_TABLE = {
+    keyword: (any(rag_keyword in keyword for rag_keyword in RAG_KEYWORDS), DEMO_KEYWORDS.get(keyword))
+    for keyword in dict.fromkeys(RAG_KEYWORDS + list(DEMO_KEYWORDS))
+}
+# The lookahead reports the longest keyword starting at every position, so
+# overlapping keywords are all seen in a single pass
+ROUTER = re.compile(
+    "(?=(" + "|".join(
+        rf"\b{re.escape(keyword)}\b" if keyword in DEMO_WHOLE_WORDS else re.escape(keyword)
+        for keyword in sorted(ROUTE_TABLE, key=len, reverse=True)
+    ) + "))",
+    re.IGNORECASE
+)
+
+
+@lru_cache(maxsize=1024)
+def _route(query: str) -> Tuple[bool, Optional[str]]:
+    """
+    Scan a query once for both routing decisions.
+    Returns whether it needs RAG and the demo bucket to answer it from.
+    Cached because the same user message is routed again to pick the RAG answer.
+    """
+    use_rag = False
+    best_rank = len(DEMO_BUCKETS)
+    for match in ROUTER.finditer(query):
+        keyword_rag, bucket = ROUTE_TABLE[match.group(1).lower()]
+        use_rag = use_rag or keyword_rag
+        if bucket is not None:
+            # Earlier buckets take precedence, like an if/elif cascade
+            best_rank = min(best_rank, DEMO_BUCKET_RANKS[bucket])
+    return use_rag, DEMO_BUCKETS[best_rank] if best_rank < len(DEMO_BUCKETS) else None
+
+
+# Mock embeddings are 1536-dimensional (same as ada-002); dimension i is
+# derived from digest byte i % 16, so each vector is 96 tiles of 16 digest bytes
+EMBEDDING_DIM = 1536
+_DIGEST_SIZE = 16
+_EMBEDDING_IDX = np.arange(EMBEDDING_DIM, dtype=np.float64).reshape(-1, _DIGEST_SIZE)
+
+
+# Seed digests come from BLAKE3 (SIMD) when installed, otherwise BLAKE2b.
+# Vectors are deterministic for a given environment.
+if blake3 is not None:
+    def _seed_digest(data: bytes) -> bytes:
+        """Return 16 deterministic seed bytes for data."""
+        return blake3.blake3(data).digest(length=16)
+else:
+    def _seed_digest(data: bytes) -> bytes:
+        """Return 16 deterministic seed bytes for data."""
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _last_user_message(messages: List[dict]) -> str:
+    """Return the content of the last user message."""
+    # Callers append the user turn last, so this is almost always O(1)
+    if messages and messages[-1].get("role") == "user":
+        return messages[-1].get("content", "")
+    for msg in reversed(messages):
+        if msg.get("role") == "user":
+            return msg.get("content", "")
+    return ""
+
 
 class MockAzureOpenAIService:
     """
     Mock service for demo mode that simulates Azure OpenAI responses.
+    Async like the real service, so it can stand in for it.
     """
     
     def __init__(self):
@@ -252,35 +350,14 @@ class MockAzureOpenAIService:
 
     def _should_use_rag(self, query: str) -> bool:
         """Determine if query should use RAG based on keywords."""
-        rag_keywords = [
-            "policy", "policies", "remote", "work", "pto", "vacation", 
-            "leave", "401k", "retirement", "benefits", "cloudsync", 
-            "product", "code review", "password", "reset", "hr", 
-            "company", "documentation", "technical", "guidelines"
-        ]
-        query_lower = query.lower()
-        return any(keyword in query_lower for keyword in rag_keywords)
+        return _route(query)[0]
 
     def _get_demo_response(self, query: str) -> dict:
         """Get appropriate demo response based on query."""
-        query_lower = query.lower()
-        
-        if "remote" in query_lower or "work from home" in query_lower:
-            return DEMO_RESPONSES["remote work"]
-        elif "pto" in query_lower or "vacation" in query_lower or "time off" in query_lower or "days" in query_lower:
-            return DEMO_RESPONSES["pto"]
-        elif "401k" in query_lower or "retirement" in query_lower or "matching" in query_lower:
-            return DEMO_RESPONSES["401k"]
-        elif "cloudsync" in query_lower or "product" in query_lower or "feature" in query_lower:
-            return DEMO_RESPONSES["cloudsync"]
-        elif "code review" in query_lower or "review" in query_lower or "pr" in query_lower:
-            return DEMO_RESPONSES["code review"]
-        elif "password" in query_lower or "reset" in query_lower:
-            return DEMO_RESPONSES["password"]
-        else:
-            return DEMO_RESPONSES["default"]
-
-    def get_chat_completion(
+        bucket = _route(query)[1]
+        return DEMO_RESPONSES[bucket or "default"]
+
+    async def get_chat_completion(
         self,
         messages: List[dict],
         temperature: float = 0.7,
@@ -289,12 +366,7 @@ class MockAzureOpenAIService:
         """
         Generate a mock chat completion.
         """
-        # Get the last user message
-        user_message = ""
-        for msg in reversed(messages):
-            if msg.get("role") == "user":
-                user_message = msg.get("content", "")
-                break
+        user_message = _last_user_message(messages)
         
         # Check if this is a RAG response (system prompt contains context)
         system_prompt = messages[0].get("content", "") if messages else ""
@@ -306,52 +378,57 @@ class MockAzureOpenAIService:
         prefix = random.choice(GENERAL_RESPONSES)
         return f"{prefix}This is a demo response. In production, I would use Azure OpenAI to provide a detailed answer to: '{user_message[:50]}...'"
 
-    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+    async def stream_chat_completion(
+        self,
+        messages: List[dict],
+        temperature: float = 0.7,
+        max_tokens: int = 1000
+    ) -> AsyncIterator[str]:
+        """Stream a mock chat completion word by word."""
+        answer = await self.get_chat_completion(messages, temperature, max_tokens)
+        for word in re.findall(r"\S+\s*", answer):
+            yield word
+
+    async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
         """
         Generate mock embeddings (deterministic based on text hash).
         """
-        embeddings = []
-        for text in texts:
-            # Create deterministic embedding based on text hash
-            hash_obj = hashlib.md5(text.encode())
-            hash_bytes = hash_obj.digest()
-            # Create 1536-dimensional embedding (same as ada-002)
-            embedding = []
-            for i in range(1536):
-                byte_idx = i % 16
-                embedding.append((hash_bytes[byte_idx] + i) / 255.0 - 0.5)
-            embeddings.append(embedding)
-        return embeddings
-
-    def get_single_embedding(self, text: str) -> List[float]:
+        if not texts:
+            return []
+        # One row of 16 digest bytes per text, broadcast across the 96 tiles
+        # of each vector (a strided add rather than a gather)
+        digests = np.frombuffer(
+            b"".join(_seed_digest(text.encode("utf-8")) for text in texts),
+            dtype=np.uint8
+        ).reshape(len(texts), 1, _DIGEST_SIZE)
+        embeddings = (digests + _EMBEDDING_IDX) / 255.0 - 0.5
+        return embeddings.reshape(len(texts), EMBEDDING_DIM).tolist()
+
+    async def get_single_embedding(self, text: str) -> List[float]:
         """Generate embedding for a single text."""
-        return self.get_embeddings([text])[0]
+        embeddings = await self.get_embeddings([text])
+        return embeddings[0]
 
     class ChatCompletions:
         """Mock chat completions class."""
         def __init__(self, parent):
             self.parent = parent
         
-        def create(self, model, messages, tools=None, tool_choice=None, temperature=0.7, max_tokens=1000):
+        async def create(self, model, messages, tools=None, tool_choice=None, temperature=0.7, max_tokens=1000):
             """Mock create method for chat completions with tool support."""
-            user_message = ""
-            for msg in reversed(messages):
-                if msg.get("role") == "user":
-                    user_message = msg.get("content", "")
-                    break
+            user_message = _last_user_message(messages)
             
             # Check if we should use RAG
             if tools and self.parent._should_use_rag(user_message):
                 # Return a tool call
-                import json
                 tool_call = MockToolCall(
                     "search_documents",
-                    json.dumps({"query": user_message})
+                    orjson.dumps({"query": user_message}).decode()
                 )
                 return MockToolResponse([tool_call])
             
             # Return direct response
-            content = self.parent.get_chat_completion(messages, temperature, max_tokens)
+            content = await self.parent.get_chat_completion(messages, temperature, max_tokens)
             return MockResponse(content)
 
     @property
@@ -363,13 +440,7 @@ class MockAzureOpenAIService:
         return ChatMock(self)
 
 
-# Singleton instance
-_mock_service: Optional[MockAzureOpenAIService] = None
-
-
+@singleton
 def get_mock_openai_service() -> MockAzureOpenAIService:
     """Get or create the mock OpenAI service singleton."""
-    global _mock_service
-    if _mock_service is None:
-        _mock_service = MockAzureOpenAIService()
-    return _mock_service
+    return MockAzureOpenAIService()
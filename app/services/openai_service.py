@@ -1,21 +1,48 @@
 """
 Open-Source LLM Service using LangChain and Hugging Face.
 Provides chat completions and embeddings using open-source models.
-Compatible with existing Azure OpenAI interface.
+Async like the Azure OpenAI service, so either can back the agent.
 """
 
+import re
+import asyncio
 import logging
 import os
-import json
-from typing import List, Optional, Any
+import orjson
+from typing import AsyncIterator, List, Optional, Any
 from pathlib import Path
+from threading import Lock
 import torch
-from langchain_community.llms import HuggingFacePipeline
 from langchain_community.embeddings import HuggingFaceEmbeddings
-from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM
+from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
+from app.core.singleton import singleton
+
+try:
+    import bitsandbytes
+except ImportError:
+    bitsandbytes = None
 
 logger = logging.getLogger(__name__)
 
+# Keywords that route a query to RAG, compiled into one alternation so a
+# query is scanned once instead of once per keyword
+RAG_KEYWORDS = [
+    "policy", "info", "product", "guide", "how to", "docs", "company",
+    "hr", "benefits", "leave", "remote", "pto", "401k", "password", "reset"
+]
+RAG_KEYWORDS_RE = re.compile("|".join(map(re.escape, RAG_KEYWORDS)), re.IGNORECASE)
+
+
+def _last_user_message(messages: List[dict]) -> str:
+    """Return the content of the last user message."""
+    # Callers append the user turn last, so this is almost always O(1)
+    if messages and messages[-1].get("role") == "user":
+        return messages[-1].get("content", "")
+    for msg in reversed(messages):
+        if msg.get("role") == "user":
+            return msg.get("content", "")
+    return ""
+
 
 class MockResponse:
     """Mock response object for compatibility with OpenAI SDK structure."""
@@ -51,14 +78,20 @@ class OpenSourceLLMService:
     """
     Service class for open-source LLM operations using LangChain and Hugging Face.
     Provides methods for chat completions and embeddings generation.
+    Model calls run in worker threads, one at a time per model, so they never block the event loop.
     """
 
     def __init__(self):
         """Initialize the open-source LLM service."""
         from app.core.config import settings
+        from app.core.cache import LRUCache
         self.device = 0 if torch.cuda.is_available() else -1
         self.model_name = settings.OPEN_SOURCE_CHAT_MODEL
         self.embedding_model_name = settings.OPEN_SOURCE_EMBEDDING_MODEL
+        self._embedding_cache = LRUCache(settings.EMBEDDING_CACHE_SIZE)
+        # Neither model is safe to call from several threads at once
+        self._chat_lock = Lock()
+        self._embedding_lock = Lock()
         
         # Initialize chat model
         self._init_chat_model()
@@ -75,24 +108,35 @@ class OpenSourceLLMService:
         try:
             logger.info(f"Loading chat model {self.model_name}...")
             tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            quantized = self.device >= 0 and bitsandbytes is not None
+            if quantized:
+                # 4-bit NF4 weights need ~4x less VRAM and memory bandwidth than fp16
+                model_kwargs = {
+                    "quantization_config": BitsAndBytesConfig(
+                        load_in_4bit=True,
+                        bnb_4bit_quant_type="nf4",
+                        bnb_4bit_compute_dtype=torch.float16,
+                        bnb_4bit_use_double_quant=True
+                    )
+                }
+            else:
+                model_kwargs = {"torch_dtype": torch.float16 if self.device >= 0 else torch.float32}
             model = AutoModelForCausalLM.from_pretrained(
                 self.model_name,
-                torch_dtype=torch.float16 if self.device >= 0 else torch.float32,
                 device_map="auto" if self.device >= 0 else None,
-                low_cpu_mem_usage=True
+                low_cpu_mem_usage=True,
+                **model_kwargs
             )
 
-            pipe = pipeline(
-                "text-generation",
-                model=model,
-                tokenizer=tokenizer,
-                max_new_tokens=512,
-                temperature=0.7,
-                do_sample=True,
-                pad_token_id=tokenizer.eos_token_id if tokenizer.eos_token_id else 50256
-            )
+            # Compile the forward pass; generate() calls it once per decoded token.
+            # Only on GPU with fp16 weights: "reduce-overhead" relies on CUDA graphs,
+            # and the bitsandbytes 4-bit kernels do not compile
+            if self.device >= 0 and not quantized:
+                model.forward = torch.compile(model.forward, mode="reduce-overhead", fullgraph=False)
 
-            self.llm = HuggingFacePipeline(pipeline=pipe)
+            self.tokenizer = tokenizer
+            self.model = model
+            self.pad_token_id = tokenizer.eos_token_id if tokenizer.eos_token_id else 50256
             logger.info(f"Chat model {self.model_name} loaded successfully")
         except Exception as e:
             logger.error(f"Error loading chat model: {e}")
@@ -127,38 +171,31 @@ class OpenSourceLLMService:
         """Mock completions attribute for compatibility with OpenAI SDK."""
         return self
 
-    def create(self, model: str, messages: List[dict], tools: Optional[List[dict]] = None, **kwargs) -> MockResponse:
+    async def create(self, model: str, messages: List[dict], tools: Optional[List[dict]] = None, **kwargs) -> MockResponse:
         """
         Mock create method for compatibility with OpenAI SDK.
         Handles both direct chat and tool-calling classification.
         """
-        prompt = self._messages_to_prompt(messages)
-        
         # If tools are provided, we need to decide if we should call search_documents
         # Simple keyword-based heuristic for open-source models that don't support native tool calling
         if tools:
-            user_msg = next((m['content'] for m in reversed(messages) if m['role'] == 'user'), "")
+            user_msg = _last_user_message(messages)
             if self._should_use_rag(user_msg):
                 tool_call = MockToolCall(
                     name="search_documents",
-                    arguments=json.dumps({"query": user_msg})
+                    arguments=orjson.dumps({"query": user_msg}).decode()
                 )
                 return MockResponse(content="", tool_calls=[tool_call])
 
         # Otherwise just generate text
-        response_text = self.get_chat_completion(messages)
+        response_text = await self.get_chat_completion(messages)
         return MockResponse(content=response_text)
 
     def _should_use_rag(self, query: str) -> bool:
         """Simple heuristic to decide if RAG is needed."""
-        rag_keywords = [
-            "policy", "info", "product", "guide", "how to", "docs", "company",
-            "hr", "benefits", "leave", "remote", "pto", "401k", "password", "reset"
-        ]
-        query_lower = query.lower()
-        return any(k in query_lower for k in rag_keywords)
-
-    def get_chat_completion(
+        return RAG_KEYWORDS_RE.search(query) is not None
+
+    async def get_chat_completion(
         self,
         messages: List[dict],
         temperature: float = 0.7,
@@ -166,31 +203,70 @@ class OpenSourceLLMService:
     ) -> str:
         """Generate a chat completion."""
         try:
-            prompt = self._messages_to_prompt(messages)
-            # LangChain HuggingFacePipeline usage
-            response = self.llm.invoke(prompt)
-            
-            # HuggingFacePipeline often returns the full prompt + completion
-            # We want to extract just the completion
-            if response.startswith(prompt):
-                response = response[len(prompt):].strip()
-            
-            return response
+            return await asyncio.to_thread(self._generate, messages, temperature)
         except Exception as e:
             logger.error(f"Error generating chat completion: {e}")
             return f"Error: {str(e)}"
 
-    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings."""
+    async def stream_chat_completion(
+        self,
+        messages: List[dict],
+        temperature: float = 0.7,
+        max_tokens: int = 1000
+    ) -> AsyncIterator[str]:
+        """Stream a chat completion. The local model yields the whole answer as one delta."""
+        yield await self.get_chat_completion(messages, temperature, max_tokens)
+
+    def _generate(self, messages: List[dict], temperature: float) -> str:
+        """Run the chat model on a conversation. Blocking."""
+        prompt = self._messages_to_prompt(messages)
+        with self._chat_lock:
+            inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
+            with torch.inference_mode():
+                output = self.model.generate(
+                    **inputs,
+                    max_new_tokens=512,
+                    temperature=temperature,
+                    do_sample=True,
+                    pad_token_id=self.pad_token_id
+                )
+        # generate() returns the prompt tokens followed by the completion,
+        # so decode only the tokens past the prompt length
+        prompt_length = inputs["input_ids"].shape[1]
+        return self.tokenizer.decode(output[0, prompt_length:], skip_special_tokens=True).strip()
+
+    async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings, running the model only for uncached texts."""
         try:
-            return self.embeddings.embed_documents(texts)
+            by_text = {}
+            misses = []
+            for text in dict.fromkeys(texts):
+                embedding = self._embedding_cache.get(text)
+                if embedding is None:
+                    misses.append(text)
+                else:
+                    by_text[text] = embedding
+
+            if misses:
+                embeddings = await asyncio.to_thread(self._embed, misses)
+                for text, embedding in zip(misses, embeddings):
+                    by_text[text] = embedding
+                    self._embedding_cache.put(text, embedding)
+
+            return [by_text[text] for text in texts]
         except Exception as e:
             logger.error(f"Error generating embeddings: {e}")
             raise
 
-    def get_single_embedding(self, text: str) -> List[float]:
+    async def get_single_embedding(self, text: str) -> List[float]:
         """Generate single embedding."""
-        return self.get_embeddings([text])[0]
+        embeddings = await self.get_embeddings([text])
+        return embeddings[0]
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """Run the embedding model on texts. Blocking."""
+        with self._embedding_lock:
+            return self.embeddings.embed_documents(texts)
 
     def _messages_to_prompt(self, messages: List[dict]) -> str:
         """Convert chat messages to a single prompt string."""
@@ -209,13 +285,7 @@ class OpenSourceLLMService:
         return "\n".join(prompt_parts)
 
 
-# Singleton instance
-_openai_service: Optional[OpenSourceLLMService] = None
-
-
+@singleton
 def get_openai_service() -> OpenSourceLLMService:
     """Get or create the open-source LLM service singleton."""
-    global _openai_service
-    if _openai_service is None:
-        _openai_service = OpenSourceLLMService()
-    return _openai_service
+    return OpenSourceLLMService()
@@ -3,13 +3,17 @@ RAG (Retrieval-Augmented Generation) Service.
 Handles document processing and retrieval using Azure AI Search.
 """
 
+import re
+import bisect
+import asyncio
 import logging
 import uuid
 from pathlib import Path
-from typing import List, Tuple, Optional, Dict, Any
+from typing import List, Tuple, Optional, Dict, Any, Iterator
 from azure.core.credentials import AzureKeyCredential
 from azure.search.documents import SearchClient
 from azure.search.documents.indexes import SearchIndexClient
+from azure.search.documents.models import VectorFilterMode, VectorizedQuery
 from azure.search.documents.indexes.models import (
     SearchIndex,
     SearchField,
@@ -18,17 +22,35 @@ from azure.search.documents.indexes.models import (
     SearchableField,
     VectorSearch,
     HnswAlgorithmConfiguration,
+    HnswParameters,
     VectorSearchProfile,
     SearchIndexCustomEntityComponent,
 )
+from app.core.cache import LRUCache
 from app.core.config import settings
+from app.core.singleton import singleton
+from app.core.prefetch import prefetch
 from app.services.azure_openai_service import get_azure_openai_service
 
 logger = logging.getLogger(__name__)
 
+# Sentence/paragraph boundaries for chunking. The lookahead reports
+# overlapping matches; every boundary is two characters long. Chunks break
+# after the last boundary of any kind in the window; changing this rule changes
+# chunk contents, so existing indexes must be rebuilt with POST /reindex.
+_BOUNDARY_RE = re.compile(r"(?=\.[ \n]|[!?] |\n\n)")
+_BOUNDARY_LENGTH = 2
+
+def _document_filter(documents: Tuple[str, ...]) -> str:
+    """Build an OData filter matching chunks of any of the given documents."""
+    names = "|".join(name.replace("'", "''") for name in documents)
+    return f"search.in(document_name, '{names}', '|')"
+
 
 class DocumentChunk:
     """Represents a chunk of a document with metadata."""
+
+    __slots__ = ("id", "content", "document_name", "chunk_index")
     
     def __init__(self, content: str, document_name: str, chunk_index: int, id: str = None):
         self.id = id or str(uuid.uuid4())
@@ -54,25 +76,45 @@ class RAGService:
         self.index_name = settings.AZURE_SEARCH_INDEX_NAME
         self._documents_path = Path(settings.DOCUMENTS_PATH)
         
-        if self.endpoint and self.key:
-            self.search_client = SearchClient(
-                endpoint=self.endpoint,
-                index_name=self.index_name,
-                credential=AzureKeyCredential(self.key)
-            )
-            self.index_client = SearchIndexClient(
-                endpoint=self.endpoint,
-                credential=AzureKeyCredential(self.key)
-            )
-            # Ensure index exists
-            self._ensure_index_exists()
-        else:
+        # Search results keyed by (normalized query, top_k, scope). A reindex here
+        # clears it; the TTL bounds staleness after a reindex in another worker
+        self._search_cache = LRUCache(settings.SEARCH_CACHE_SIZE, ttl=settings.SEARCH_CACHE_TTL_SECONDS)
+        # "[From <document>]:" headers for context assembly, built once per document
+        self._context_headers: Dict[str, Tuple[str, str]] = {}
+        
+        # The search clients and the index check are deferred to the first
+        # search or indexing run, so constructing the service stays cheap
+        self.search_client: Optional[SearchClient] = None
+        self.index_client: Optional[SearchIndexClient] = None
+        self._connect_lock = asyncio.Lock()
+        if not (self.endpoint and self.key):
             logger.warning("Azure AI Search credentials not provided. RAG service will be limited.")
-            self.search_client = None
-            self.index_client = None
 
         logger.info("RAG Service initialized with Azure AI Search")
 
+    def _connect(self) -> None:
+        """Create the search clients and make sure the index exists."""
+        index_client = SearchIndexClient(
+            endpoint=self.endpoint,
+            credential=AzureKeyCredential(self.key)
+        )
+        self.index_client = index_client
+        self._ensure_index_exists()
+        self.search_client = SearchClient(
+            endpoint=self.endpoint,
+            index_name=self.index_name,
+            credential=AzureKeyCredential(self.key)
+        )
+
+    async def _get_search_client(self) -> Optional[SearchClient]:
+        """Return the search client, connecting on first use."""
+        if self.search_client or not (self.endpoint and self.key):
+            return self.search_client
+        async with self._connect_lock:
+            if not self.search_client:
+                await asyncio.to_thread(self._connect)
+        return self.search_client
+
     def _ensure_index_exists(self) -> None:
         """Create the Azure AI Search index if it doesn't already exist."""
         try:
@@ -97,7 +139,15 @@ class RAGService:
 
             vector_search = VectorSearch(
                 algorithms=[
-                    HnswAlgorithmConfiguration(name="myHnsw")
+                    HnswAlgorithmConfiguration(
+                        name="myHnsw",
+                        parameters=HnswParameters(
+                            m=settings.HNSW_M,
+                            ef_construction=settings.HNSW_EF_CONSTRUCTION,
+                            ef_search=settings.HNSW_EF_SEARCH,
+                            metric="cosine"
+                        )
+                    )
                 ],
                 profiles=[
                     VectorSearchProfile(
@@ -116,130 +166,212 @@ class RAGService:
             self.index_client.create_index(index)
             logger.info(f"Successfully created index '{self.index_name}'")
 
-    def _chunk_text(self, text: str, chunk_size: int = None, overlap: int = None) -> List[str]:
-        """Split text into overlapping chunks."""
+    def _chunk_text(self, text: str, chunk_size: int = None, overlap: int = None) -> Iterator[str]:
+        """Split text into overlapping chunks, yielding them one at a time."""
         chunk_size = chunk_size or settings.CHUNK_SIZE
         overlap = overlap or settings.CHUNK_OVERLAP
         
-        chunks = []
         start = 0
         text_length = len(text)
         
+        # Find every boundary once, then binary-search per chunk window
+        boundary_ends = [m.start() + _BOUNDARY_LENGTH for m in _BOUNDARY_RE.finditer(text)]
+        
         while start < text_length:
             end = min(start + chunk_size, text_length)
             if end < text_length:
-                for boundary in ['. ', '.\n', '! ', '? ', '\n\n']:
-                    last_boundary = text.rfind(boundary, start, end)
-                    if last_boundary > start + chunk_size // 2:
-                        end = last_boundary + len(boundary)
-                        break
+                # Break after the last boundary in the window if it is past the halfway point
+                i = bisect.bisect_right(boundary_ends, end) - 1
+                if i >= 0 and boundary_ends[i] - _BOUNDARY_LENGTH > start + chunk_size // 2:
+                    end = boundary_ends[i]
             
             chunk = text[start:end].strip()
             if chunk:
-                chunks.append(chunk)
+                yield chunk
             
             if end >= text_length:
                 break
             start = end - overlap
-        return chunks
 
-    def index_documents(self) -> int:
+    def _read_document(self, doc_path: Path) -> str:
+        """Read a document from disk."""
+        with open(doc_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    async def index_documents(self) -> int:
         """Index all documents in the documents directory to Azure AI Search."""
-        if not self.search_client:
+        if not await self._get_search_client():
             logger.error("Search client not initialized. Cannot index documents.")
             return 0
 
         logger.info("Indexing documents to Azure AI Search...")
+        batch_size = 100
+        embedding_batch_size = 64
+        max_concurrent_embeddings = 4
+        max_concurrent_uploads = 8
+        pending_texts: List[str] = []
+        pending_meta: List[Tuple[str, int]] = []
         documents_to_upload = []
+        embedding_slots = asyncio.Semaphore(max_concurrent_embeddings)
+        embedding_tasks: List[asyncio.Task] = []
+        upload_slots = asyncio.Semaphore(max_concurrent_uploads)
+        upload_tasks: List[asyncio.Task] = []
         
-        for doc_path in self._documents_path.glob("*.txt"):
+        async def embed(texts: List[str], meta: List[Tuple[str, int]]) -> None:
+            """Embed one batch of chunks, queue them for upload and free its slot."""
             try:
-                with open(doc_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-                
-                text_chunks = self._chunk_text(content)
-                chunk_texts = [c for c in text_chunks]
-                embeddings = self.openai_service.get_embeddings(chunk_texts)
-                
-                for i, (chunk_text, embedding) in enumerate(zip(text_chunks, embeddings)):
+                embeddings = await self.openai_service.get_embeddings(texts)
+                for chunk_text, (document_name, chunk_index), embedding in zip(texts, meta, embeddings):
                     documents_to_upload.append({
                         "id": str(uuid.uuid4()),
                         "content": chunk_text,
-                        "document_name": doc_path.name,
-                        "chunk_index": i,
+                        "document_name": document_name,
+                        "chunk_index": chunk_index,
                         "content_vector": embedding
                     })
-                
-                logger.info(f"Prepared {doc_path.name}: {len(text_chunks)} chunks")
-                
+            except Exception as e:
+                logger.error(f"Error embedding {len(texts)} chunks: {e}")
+            finally:
+                embedding_slots.release()
+        
+        async def flush_embeddings() -> None:
+            """Start embedding the pending chunks as one batch."""
+            # Embedding requests are network-bound, so several batches are in flight
+            # while later documents are chunked; the slot bounds buffered chunks
+            await embedding_slots.acquire()
+            embedding_tasks.append(asyncio.create_task(embed(pending_texts[:], pending_meta[:])))
+            pending_texts.clear()
+            pending_meta.clear()
+        
+        async def upload(batch: List[Dict[str, Any]]) -> int:
+            """Upload one batch and free its slot."""
+            try:
+                await asyncio.to_thread(self.search_client.upload_documents, documents=batch)
+            finally:
+                upload_slots.release()
+            return len(batch)
+        
+        async def flush_uploads(min_size: int) -> None:
+            """Start uploads for queued documents while at least min_size are waiting."""
+            while documents_to_upload and len(documents_to_upload) >= min_size:
+                batch = documents_to_upload[:batch_size]
+                del documents_to_upload[:batch_size]
+                # Waiting for a slot keeps at most max_concurrent_uploads batches in memory
+                await upload_slots.acquire()
+                upload_tasks.append(asyncio.create_task(upload(batch)))
+        
+        # File I/O is blocking, so read files in worker threads a few documents
+        # ahead while the current one is chunked, embedded and uploaded
+        async for doc_path, read in prefetch(self._read_document, self._documents_path.glob("*.txt")):
+            try:
+                content = await read
             except Exception as e:
                 logger.error(f"Error processing {doc_path}: {e}")
+                continue
+            
+            # Stream chunks into a buffer shared across files so small documents
+            # share embedding requests and no document's chunk list is built up front
+            chunk_count = 0
+            for chunk_text in self._chunk_text(content):
+                pending_texts.append(chunk_text)
+                pending_meta.append((doc_path.name, chunk_count))
+                chunk_count += 1
+                
+                if len(pending_texts) >= embedding_batch_size:
+                    await flush_embeddings()
+                    # Upload full batches as they fill so the whole corpus is never held in memory;
+                    # uploads are network-bound, so several run concurrently
+                    await flush_uploads(batch_size)
+            logger.info(f"Prepared {doc_path.name}: {chunk_count} chunks")
         
-        if not documents_to_upload:
+        if pending_texts:
+            await flush_embeddings()
+        await asyncio.gather(*embedding_tasks)
+        await flush_uploads(1)
+        total_uploaded = sum(await asyncio.gather(*upload_tasks))
+        
+        if not total_uploaded:
             logger.warning("No documents found to index")
             return 0
-        
-        # Upload in batches
-        batch_size = 100
-        total_uploaded = 0
-        for i in range(0, len(documents_to_upload), batch_size):
-            batch = documents_to_upload[i:i + batch_size]
-            self.search_client.upload_documents(documents=batch)
-            total_uploaded += len(batch)
             
         logger.info(f"Successfully uploaded {total_uploaded} chunks to Azure AI Search")
+        self._search_cache.clear()
+        
         return total_uploaded
 
-    def search(
+    async def search(
         self, 
         query: str, 
-        top_k: int = None
+        top_k: int = None,
+        documents: Optional[List[str]] = None
     ) -> List[Dict[str, Any]]:
-        """Search for relevant document chunks using vector search."""
-        if not self.search_client:
+        """
+        Search for relevant document chunks using vector search.
+        When documents is given, only chunks of those documents are searched.
+        """
+        if not (self.endpoint and self.key):
             logger.warning("Search client not initialized.")
             return []
         
         top_k = top_k or settings.TOP_K_RESULTS
-        query_vector = self.openai_service.get_single_embedding(query)
+        scope = tuple(sorted(documents)) if documents else None
+        cache_key = (" ".join(query.lower().split()), top_k, scope)
+        results = self._search_cache.get(cache_key)
+        if results is not None:
+            return results
+        
+        search_client = await self._get_search_client()
+        query_vector = await self.openai_service.get_single_embedding(query)
         
-        from azure.search.documents.models import VectorizedQuery
         vector_query = VectorizedQuery(vector=query_vector, k_nearest_neighbors=top_k, fields="content_vector")
         
-        results = self.search_client.search(
-            search_text=query,
-            vector_queries=[vector_query],
-            select=["content", "document_name", "chunk_index"],
-            top=top_k
-        )
+        # Pre-filter on the filterable document_name field so scoped queries
+        # only traverse the vectors of the requested documents
+        filter_options = {}
+        if scope:
+            filter_options = {
+                "filter": _document_filter(scope),
+                "vector_filter_mode": VectorFilterMode.PRE_FILTER
+            }
         
-        return list(results)
+        # The search client is blocking and pages lazily, so drain it off the event loop
+        results = await asyncio.to_thread(
+            lambda: list(search_client.search(
+                search_text=query,
+                vector_queries=[vector_query],
+                select=["content", "document_name", "chunk_index"],
+                top=top_k,
+                **filter_options
+            ))
+        )
+        self._search_cache.put(cache_key, results)
+        return results
 
-    def get_context_for_query(self, query: str) -> Tuple[str, List[str]]:
+    async def get_context_for_query(self, query: str) -> Tuple[str, List[str]]:
         """Get relevant context and sources for a query."""
-        results = self.search(query)
+        results = await self.search(query)
         
         if not results:
             return "", []
         
-        context_parts = []
-        sources = set()
-        
+        # Interleave cached headers (the second form carries the separator) with
+        # chunk contents so the context is built by one join with no per-chunk strings
+        headers = self._context_headers
+        parts = []
         for result in results:
-            context_parts.append(f"[From {result['document_name']}]:\n{result['content']}")
-            sources.add(result['document_name'])
-        
-        context = "\n\n---\n\n".join(context_parts)
-        return context, list(sources)
-
-
-# Singleton instance
-_rag_service: Optional[RAGService] = None
+            name = result["document_name"]
+            header = headers.get(name)
+            if header is None:
+                header = headers[name] = (f"[From {name}]:\n", f"\n\n---\n\n[From {name}]:\n")
+            parts.append(header[1] if parts else header[0])
+            parts.append(result["content"])
+        context = "".join(parts)
+        # Sources in ranking order, without duplicates
+        sources = list(dict.fromkeys(result["document_name"] for result in results))
+        return context, sources
 
 
+@singleton
 def get_rag_service() -> RAGService:
     """Get or create the RAG service singleton."""
-    global _rag_service
-    if _rag_service is None:
-        _rag_service = RAGService()
-    return _rag_service
+    return RAGService()
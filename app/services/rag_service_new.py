@@ -4,7 +4,11 @@ Handles document processing, embedding storage, and retrieval using Azure AI Sea
 """
 
 import os
+import re
+import bisect
+import asyncio
 import logging
+from itertools import takewhile
 from pathlib import Path
 from typing import List, Tuple, Optional
 import numpy as np
@@ -18,16 +22,28 @@ from azure.search.documents.indexes.models import (
     VectorSearch,
     VectorSearchProfile,
     HnswAlgorithmConfiguration,
+    HnswParameters,
 )
 from app.core.config import settings
+from app.core.singleton import singleton
+from app.core.prefetch import prefetch
 from app.services.azure_openai_service import get_azure_openai_service
 
 logger = logging.getLogger(__name__)
 
+# Sentence/paragraph boundaries for chunking. The lookahead reports
+# overlapping matches; every boundary is two characters long. Chunks break
+# after the last boundary of any kind in the window; changing this rule changes
+# chunk contents, so existing indexes must be rebuilt with index_documents().
+_BOUNDARY_RE = re.compile(r"(?=\.[ \n]|[!?] |\n\n)")
+_BOUNDARY_LENGTH = 2
+
 
 class DocumentChunk:
     """Represents a chunk of a document with metadata."""
 
+    __slots__ = ("id", "content", "document_name", "chunk_index")
+
     def __init__(self, content: str, document_name: str, chunk_index: int, id: str = None):
         self.content = content
         self.document_name = document_name
@@ -58,25 +74,24 @@ class RAGService:
         # Create index if it doesn't exist
         self._create_index_if_not_exists()
 
-        # Index documents if available
-        if self._documents_path.exists():
-            self.index_documents()
-
+        # Indexing is async now, so the constructor can no longer run it. This module is
+        # not wired into the app (main uses rag_service); callers must await
+        # index_documents() themselves before searching a fresh index
         logger.info("RAG Service initialized")
 
     def _initialize_search_clients(self) -> None:
         """Initialize Azure AI Search clients."""
-        if not settings.AZURE_SEARCH_ENDPOINT or not settings.AZURE_SEARCH_KEY:
+        if not settings.AZURE_SEARCH_SERVICE_ENDPOINT or not settings.AZURE_SEARCH_ADMIN_KEY:
             raise ValueError("Azure AI Search endpoint and key must be configured")
 
-        credential = AzureKeyCredential(settings.AZURE_SEARCH_KEY)
+        credential = AzureKeyCredential(settings.AZURE_SEARCH_ADMIN_KEY)
         self._search_client = SearchClient(
-            endpoint=settings.AZURE_SEARCH_ENDPOINT,
+            endpoint=settings.AZURE_SEARCH_SERVICE_ENDPOINT,
             index_name=settings.AZURE_SEARCH_INDEX_NAME,
             credential=credential
         )
         self._index_client = SearchIndexClient(
-            endpoint=settings.AZURE_SEARCH_ENDPOINT,
+            endpoint=settings.AZURE_SEARCH_SERVICE_ENDPOINT,
             credential=credential
         )
 
@@ -129,7 +144,13 @@ class RAGService:
                 ],
                 algorithms=[
                     HnswAlgorithmConfiguration(
-                        name="my-hnsw-config"
+                        name="my-hnsw-config",
+                        parameters=HnswParameters(
+                            m=settings.HNSW_M,
+                            ef_construction=settings.HNSW_EF_CONSTRUCTION,
+                            ef_search=settings.HNSW_EF_SEARCH,
+                            metric="cosine"
+                        )
                     )
                 ]
             )
@@ -162,17 +183,18 @@ class RAGService:
         start = 0
         text_length = len(text)
 
+        # Find every boundary once, then binary-search per chunk window
+        boundary_ends = [m.start() + _BOUNDARY_LENGTH for m in _BOUNDARY_RE.finditer(text)]
+
         while start < text_length:
             end = min(start + chunk_size, text_length)
 
-            # Try to break at sentence or word boundary
+            # Try to break at sentence or paragraph boundary
             if end < text_length:
-                # Look for sentence boundary
-                for boundary in ['. ', '.\n', '! ', '? ', '\n\n']:
-                    last_boundary = text.rfind(boundary, start, end)
-                    if last_boundary > start + chunk_size // 2:
-                        end = last_boundary + len(boundary)
-                        break
+                # Break after the last boundary in the window if it is past the halfway point
+                i = bisect.bisect_right(boundary_ends, end) - 1
+                if i >= 0 and boundary_ends[i] - _BOUNDARY_LENGTH > start + chunk_size // 2:
+                    end = boundary_ends[i]
 
             chunk = text[start:end].strip()
             if chunk:
@@ -190,7 +212,21 @@ class RAGService:
 
         return chunks
 
-    def index_documents(self) -> int:
+    def _read_and_chunk(self, doc_path: Path) -> List[str]:
+        """
+        Read a document from disk and split it into chunks.
+
+        Args:
+            doc_path: Path of the document to read
+
+        Returns:
+            List of text chunks
+        """
+        with open(doc_path, "r", encoding="utf-8") as f:
+            content = f.read()
+        return self._chunk_text(content)
+
+    async def index_documents(self) -> int:
         """
         Index all documents in the documents directory.
 
@@ -198,40 +234,37 @@ class RAGService:
             Number of chunks indexed
         """
         logger.info("Indexing documents...")
-        documents_to_index = []
+        chunks: List[DocumentChunk] = []
 
-        # Process all text files in documents directory
-        for doc_path in self._documents_path.glob("*.txt"):
+        # Process all text files in documents directory. File I/O and chunking are
+        # blocking, so they run in worker threads a few documents ahead of this loop
+        async for doc_path, read in prefetch(self._read_and_chunk, self._documents_path.glob("*.txt")):
             try:
-                with open(doc_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-
-                text_chunks = self._chunk_text(content)
-                for i, chunk_text in enumerate(text_chunks):
-                    chunk = DocumentChunk(
-                        content=chunk_text,
-                        document_name=doc_path.name,
-                        chunk_index=i
-                    )
-
-                    # Generate embedding for the chunk
-                    embedding = self.openai_service.get_single_embedding(chunk_text)
-
-                    # Prepare document for Azure AI Search
-                    document = {
-                        "id": chunk.id,
-                        "content": chunk_text,
-                        "document_name": doc_path.name,
-                        "chunk_index": i,
-                        "content_vector": embedding
-                    }
-                    documents_to_index.append(document)
-
+                text_chunks = await read
+                chunks.extend(
+                    DocumentChunk(content=chunk_text, document_name=doc_path.name, chunk_index=i)
+                    for i, chunk_text in enumerate(text_chunks)
+                )
                 logger.info(f"Processed {doc_path.name}: {len(text_chunks)} chunks")
 
             except Exception as e:
                 logger.error(f"Error processing {doc_path}: {e}")
 
+        # Embed every chunk in one batched call instead of one request per chunk
+        embeddings = await self.openai_service.get_embeddings([chunk.content for chunk in chunks]) if chunks else []
+
+        # Prepare documents for Azure AI Search
+        documents_to_index = [
+            {
+                "id": chunk.id,
+                "content": chunk.content,
+                "document_name": chunk.document_name,
+                "chunk_index": chunk.chunk_index,
+                "content_vector": embedding
+            }
+            for chunk, embedding in zip(chunks, embeddings)
+        ]
+
         if not documents_to_index:
             logger.warning("No documents found to index")
             return 0
@@ -243,7 +276,7 @@ class RAGService:
         for i in range(0, len(documents_to_index), batch_size):
             batch = documents_to_index[i:i + batch_size]
             try:
-                result = self._search_client.upload_documents(documents=batch)
+                result = await asyncio.to_thread(self._search_client.upload_documents, documents=batch)
                 successful = sum(1 for r in result if r.succeeded)
                 total_indexed += successful
                 logger.info(f"Indexed batch {i//batch_size + 1}: {successful}/{len(batch)} documents")
@@ -253,7 +286,7 @@ class RAGService:
         logger.info(f"Indexed {total_indexed} chunks from documents")
         return total_indexed
 
-    def search(
+    async def search(
         self,
         query: str,
         top_k: int = None
@@ -271,32 +304,41 @@ class RAGService:
         top_k = top_k or settings.TOP_K_RESULTS
 
         # Generate query embedding
-        query_embedding = self.openai_service.get_single_embedding(query)
+        query_embedding = await self.openai_service.get_single_embedding(query)
 
         # Perform vector search
         try:
-            results = self._search_client.search(
-                search_text="",  # Empty text search, using only vectors
-                vector_queries=[{
-                    "vector": query_embedding,
-                    "k": top_k,
-                    "fields": "content_vector"
-                }],
-                select=["id", "content", "document_name", "chunk_index"],
-                top=top_k
+            # The search client is blocking and pages lazily, so drain it off the event loop.
+            # Pure vector results arrive in descending score order, so stop at the first
+            # one below the threshold instead of fetching and filtering the rest.
+            results = await asyncio.to_thread(
+                lambda: list(takewhile(
+                    lambda result: result.get("@search.score", 0.0) >= settings.SIMILARITY_THRESHOLD,
+                    self._search_client.search(
+                        search_text="",  # Empty text search, using only vectors
+                        vector_queries=[{
+                            "vector": query_embedding,
+                            "k": top_k,
+                            "fields": "content_vector"
+                        }],
+                        select=["id", "content", "document_name", "chunk_index"],
+                        top=top_k
+                    )
+                ))
             )
 
-            search_results = []
-            for result in results:
-                score = result.get("@search.score", 0.0)
-                if score >= settings.SIMILARITY_THRESHOLD:
-                    chunk = DocumentChunk(
+            search_results = [
+                (
+                    DocumentChunk(
                         content=result["content"],
                         document_name=result["document_name"],
                         chunk_index=result["chunk_index"],
                         id=result["id"]
-                    )
-                    search_results.append((chunk, float(score)))
+                    ),
+                    float(result.get("@search.score", 0.0))
+                )
+                for result in results
+            ]
 
             logger.info(f"Found {len(search_results)} relevant chunks for query")
             return search_results
@@ -305,7 +347,7 @@ class RAGService:
             logger.error(f"Error performing search: {e}")
             return []
 
-    def get_context_for_query(self, query: str) -> Tuple[str, List[str]]:
+    async def get_context_for_query(self, query: str) -> Tuple[str, List[str]]:
         """
         Get relevant context and sources for a query.
 
@@ -315,35 +357,27 @@ class RAGService:
         Returns:
             Tuple of (context_string, source_list)
         """
-        results = self.search(query)
+        results = await self.search(query)
 
         if not results:
             return "", []
 
-        # Build context from retrieved chunks
-        context_parts = []
-        sources = set()
-
-        for chunk, score in results:
-            context_parts.append(f"[From {chunk.document_name}]:\n{chunk.content}")
-            sources.add(chunk.document_name)
-
-        context = "\n\n---\n\n".join(context_parts)
-        return context, list(sources)
-
-
-# Singleton instance
-_rag_service: Optional[RAGService] = None
+        # Build context from retrieved chunks in a single join
+        context = "\n\n---\n\n".join(
+            f"[From {chunk.document_name}]:\n{chunk.content}" for chunk, _ in results
+        )
+        # Sources in ranking order, without duplicates
+        sources = list(dict.fromkeys(chunk.document_name for chunk, _ in results))
+        return context, sources
 
 
+@singleton
 def get_rag_service() -> RAGService:
     """
     Get or create the RAG service singleton.
+    The service does not index on construction; await index_documents() to populate it.
 
     Returns:
         RAGService instance
     """
-    global _rag_service
-    if _rag_service is None:
-        _rag_service = RAGService()
-    return _rag_service
+    return RAGService()
@@ -4,15 +4,24 @@ Provides in-memory session storage for conversation history.
 """
 
 import uuid
+import time
+import asyncio
 import logging
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import List, Optional
 from threading import Lock
 from app.core.config import settings
-from app.models.schemas import SessionData, SessionMessage
+from app.core.singleton import singleton
+from app.models.schemas import SessionData, SessionMessage, utc_now
 
 logger = logging.getLogger(__name__)
 
+# Writers to different sessions rarely share one of these locks
+LOCK_STRIPES = 64
+# Expired sessions are swept at most this often
+CLEANUP_INTERVAL_SECONDS = 60.0
+
 
 class SessionService:
     """
@@ -22,10 +31,15 @@ class SessionService:
     
     def __init__(self):
         """Initialize the session store."""
-        self._sessions: Dict[str, SessionData] = {}
+        # Ordered least to most recently used, so eviction and expiry start at the front
+        self._sessions: "OrderedDict[str, SessionData]" = OrderedDict()
+        # Guards the expiry sweep; per-session writes use a striped lock and reads take no lock
         self._lock = Lock()
+        self._locks = [Lock() for _ in range(LOCK_STRIPES)]
+        self._next_cleanup = time.monotonic() + CLEANUP_INTERVAL_SECONDS
         self._max_history = settings.MAX_SESSION_HISTORY
         self._timeout_minutes = settings.SESSION_TIMEOUT_MINUTES
+        self._max_sessions = settings.MAX_SESSIONS
         logger.info("Session Service initialized")
 
     def get_or_create_session(self, session_id: Optional[str] = None) -> str:
@@ -38,27 +52,57 @@ class SessionService:
         Returns:
             Valid session ID
         """
-        with self._lock:
-            # Clean up expired sessions periodically
+        # Clean up expired sessions periodically
+        if time.monotonic() >= self._next_cleanup:
             self._cleanup_expired_sessions()
-            
-            if session_id and session_id in self._sessions:
-                # Update last accessed time
-                self._sessions[session_id].last_accessed = datetime.utcnow()
-                return session_id
-            
-            # Create new session
-            new_session_id = str(uuid.uuid4())
-            self._sessions[new_session_id] = SessionData(
-                session_id=new_session_id,
-                messages=[],
-                created_at=datetime.utcnow(),
-                last_accessed=datetime.utcnow()
-            )
-            logger.info(f"Created new session: {new_session_id}")
-            return new_session_id
+        
+        session = self._sessions.get(session_id) if session_id else None
+        if session is not None:
+            # Update last accessed time
+            session.last_accessed = utc_now()
+            self._touch(session_id)
+            return session_id
+        
+        # Create new session
+        new_session_id = str(uuid.uuid4())
+        now = utc_now()
+        session = SessionData(
+            session_id=new_session_id,
+            # Bounded history: appending evicts the oldest message in O(1)
+            messages=deque(maxlen=self._max_history * 2),
+            created_at=now,
+            last_accessed=now
+        )
+        # Keep the store bounded by evicting the least recently used sessions
+        while len(self._sessions) >= self._max_sessions:
+            try:
+                evicted_id, _ = self._sessions.popitem(last=False)
+            except KeyError:
+                break
+            logger.info(f"Evicted least recently used session: {evicted_id}")
+        self._sessions[new_session_id] = session
+        logger.info(f"Created new session: {new_session_id}")
+        return new_session_id
+
+    def _touch(self, session_id: str) -> None:
+        """Mark a session as most recently used."""
+        try:
+            self._sessions.move_to_end(session_id)
+        except KeyError:
+            # Cleared or evicted concurrently
+            pass
 
-    def add_message(self, session_id: str, role: str, content: str) -> None:
+    def _lock_for(self, session_id: str) -> Lock:
+        """Return the lock stripe guarding writes to a session."""
+        return self._locks[hash(session_id) % LOCK_STRIPES]
+
+    def add_message(
+        self,
+        session_id: str,
+        role: str,
+        content: str,
+        timestamp: Optional[datetime] = None
+    ) -> None:
         """
         Add a message to session history.
         
@@ -66,25 +110,23 @@ class SessionService:
             session_id: Session identifier
             role: Message role ('user' or 'assistant')
             content: Message content
+            timestamp: Optional message time, defaults to now
         """
-        with self._lock:
-            if session_id not in self._sessions:
-                logger.warning(f"Session not found: {session_id}")
-                return
-            
-            session = self._sessions[session_id]
+        session = self._sessions.get(session_id)
+        if session is None:
+            logger.warning(f"Session not found: {session_id}")
+            return
+        
+        with self._lock_for(session_id):
+            timestamp = timestamp or utc_now()
             message = SessionMessage(
                 role=role,
                 content=content,
-                timestamp=datetime.utcnow()
+                timestamp=timestamp
             )
             session.messages.append(message)
-            
-            # Trim history if exceeds max limit
-            if len(session.messages) > self._max_history * 2:
-                session.messages = session.messages[-self._max_history * 2:]
-            
-            session.last_accessed = datetime.utcnow()
+            session.last_accessed = timestamp
+        self._touch(session_id)
 
     def get_conversation_history(self, session_id: str) -> List[dict]:
         """
@@ -96,15 +138,35 @@ class SessionService:
         Returns:
             List of message dictionaries
         """
-        with self._lock:
-            if session_id not in self._sessions:
-                return []
+        session = self._sessions.get(session_id)
+        if session is None:
+            return []
+        
+        # Copying a deque is atomic under the GIL, so no lock is needed for a snapshot
+        return [
+            {"role": msg.role, "content": msg.content}
+            for msg in tuple(session.messages)
+        ]
+
+    def get_recent(self, session_id: str, n: int) -> List[dict]:
+        """
+        Get the last n messages of a session formatted for LLM.
+        
+        Args:
+            session_id: Session identifier
+            n: Number of most recent messages to return
             
-            session = self._sessions[session_id]
-            return [
-                {"role": msg.role, "content": msg.content}
-                for msg in session.messages[-self._max_history * 2:]
-            ]
+        Returns:
+            List of message dictionaries
+        """
+        session = self._sessions.get(session_id)
+        if session is None or n <= 0:
+            return []
+        
+        return [
+            {"role": msg.role, "content": msg.content}
+            for msg in tuple(session.messages)[-n:]
+        ]
 
     def clear_session(self, session_id: str) -> bool:
         """
@@ -116,29 +178,46 @@ class SessionService:
         Returns:
             True if session was cleared, False if not found
         """
-        with self._lock:
-            if session_id in self._sessions:
-                del self._sessions[session_id]
-                logger.info(f"Cleared session: {session_id}")
-                return True
-            return False
+        if self._sessions.pop(session_id, None) is not None:
+            logger.info(f"Cleared session: {session_id}")
+            return True
+        return False
+
+    def reset(self) -> None:
+        """Remove every session, e.g. between tests, without rebuilding the service."""
+        self._sessions.clear()
+        logger.info("Cleared all sessions")
 
     def _cleanup_expired_sessions(self) -> None:
         """Remove expired sessions based on timeout."""
-        cutoff_time = datetime.utcnow() - timedelta(minutes=self._timeout_minutes)
-        expired_sessions = [
-            sid for sid, session in self._sessions.items()
-            if session.last_accessed < cutoff_time
-        ]
-        for sid in expired_sessions:
-            del self._sessions[sid]
-            logger.debug(f"Cleaned up expired session: {sid}")
-
+        # Only one caller sweeps; others skip rather than wait
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._next_cleanup = time.monotonic() + CLEANUP_INTERVAL_SECONDS
+            cutoff_time = utc_now() - timedelta(minutes=self._timeout_minutes)
+            # Sessions are in access order, so stop at the first one still alive.
+            # A fresh iterator per step tolerates sessions added concurrently.
+            while True:
+                try:
+                    sid, session = next(iter(self._sessions.items()))
+                except StopIteration:
+                    break
+                if session.last_accessed >= cutoff_time:
+                    break
+                self._sessions.pop(sid, None)
+                logger.debug(f"Cleaned up expired session: {sid}")
+        finally:
+            self._lock.release()
 
-# Singleton instance
-_session_service: Optional[SessionService] = None
+    async def reap_expired_sessions(self, interval: float = CLEANUP_INTERVAL_SECONDS) -> None:
+        """Sweep expired sessions every interval seconds, so idle processes free them too."""
+        while True:
+            await asyncio.sleep(interval)
+            self._cleanup_expired_sessions()
 
 
+@singleton
 def get_session_service() -> SessionService:
     """
     Get or create the session service singleton.
@@ -146,7 +225,4 @@ def get_session_service() -> SessionService:
     Returns:
         SessionService instance
     """
-    global _session_service
-    if _session_service is None:
-        _session_service = SessionService()
-    return _session_service
+    return SessionService()
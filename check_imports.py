@@ -1,22 +1,26 @@
+import importlib.util
 import logging
 import sys
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("check_imports")
 
+# Third-party packages only need to be resolvable; find_spec locates a module
+# without executing it, so these checks avoid each package's import cost
+BASE_MODULES = [
+    "fastapi",
+    "pydantic",
+    "numpy",
+    "azure.search.documents",
+    "azure.identity",
+    "openai",
+]
+
 try:
-    logger.info("Importing fastapi...")
-    import fastapi
-    logger.info("Importing pydantic...")
-    import pydantic
-    logger.info("Importing numpy...")
-    import numpy
-    logger.info("Importing azure.search.documents...")
-    import azure.search.documents
-    logger.info("Importing azure.identity...")
-    import azure.identity
-    logger.info("Importing openai...")
-    import openai
+    for name in BASE_MODULES:
+        if importlib.util.find_spec(name) is None:
+            raise ImportError(f"No module named '{name}'")
+        logger.info(f"{name} available")
     logger.info("All base imports successful")
     
     logger.info("Importing app modules...")
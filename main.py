@@ -3,15 +3,18 @@ Main FastAPI Application Entry Point.
 Configures and runs the AI Agent RAG Backend application.
 """
 
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from anyio import to_thread
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import ORJSONResponse
 from app.api.routes import router
 from app.core.config import settings
+from app.core.static_files import CachedStaticFiles
 
 # Configure logging
 logging.basicConfig(
@@ -33,27 +36,56 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting AI Agent RAG Backend...")
     
-    # Initialize services
-    try:
-        from app.services.rag_service import get_rag_service
-        from app.services.agent_service import get_agent_service
-        
-        # Pre-initialize services
-        # Note: In production, index_documents should be handled by a background task or CI/CD
-        rag_service = get_rag_service()
-        agent_service = get_agent_service()
-        
-        logger.info("AI Agent and RAG Services initialized")
-        logger.info("Application startup complete")
-        
-    except Exception as e:
-        logger.error(f"Error during startup: {e}")
-        raise
+    # Raise the threadpool limit used for the remaining sync paths
+    to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_TOKENS
+    
+    # asyncio.to_thread only carries blocking I/O here (Azure Search calls, file
+    # reads), so size its pool for I/O rather than the CPU-based default
+    io_pool = ThreadPoolExecutor(max_workers=settings.IO_THREADPOOL_SIZE, thread_name_prefix="rag-io")
+    asyncio.get_running_loop().set_default_executor(io_pool)
+    
+    # Warm the service singletons in the background so the server accepts
+    # traffic immediately; routes that need them wait on app.state.ready
+    from app.services.azure_openai_service import get_azure_openai_service
+    from app.services.session_service import get_session_service
+    from app.services.rag_service import get_rag_service
+    from app.services.agent_service import get_agent_service
+    
+    # Read and compress the frontend now, so first requests don't do it on the event loop
+    if FRONTEND_DIR.exists():
+        preloaded = await asyncio.to_thread(frontend_files.preload)
+        logger.info(f"Preloaded {preloaded} frontend files")
+    
+    app.state.ready = asyncio.Event()
+    
+    async def warmup() -> None:
+        """Construct every singleton off the event loop, then mark the app ready."""
+        try:
+            # Note: In production, index_documents should be handled by a background task or CI/CD
+            for getter in (get_azure_openai_service, get_session_service, get_rag_service, get_agent_service):
+                await asyncio.to_thread(getter)
+            logger.info("AI Agent and RAG Services initialized")
+        except Exception as e:
+            # Requests will retry construction and surface the error themselves
+            logger.error(f"Error during service warm-up: {e}")
+        finally:
+            app.state.ready.set()
+    
+    app.state.warmup_task = asyncio.create_task(warmup())
+    # Expire idle sessions even when no requests arrive to trigger the sweep
+    app.state.session_reaper = asyncio.create_task(get_session_service().reap_expired_sessions())
+    logger.info("Application startup complete")
     
     yield
     
     # Shutdown
     logger.info("Shutting down AI Agent RAG Backend...")
+    app.state.warmup_task.cancel()
+    app.state.session_reaper.cancel()
+    if get_azure_openai_service.cache_info().currsize:
+        # Closing the OpenAI client also closes its pooled HTTP/2 connections
+        await get_azure_openai_service().client.close()
+    io_pool.shutdown(wait=False, cancel_futures=True)
 
 
 # Create FastAPI application
@@ -61,6 +93,7 @@ app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
     description="AI Agent RAG Backend",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -77,17 +110,23 @@ app.add_middleware(
 app.include_router(router, prefix="/api/v1")
 
 # Mount static files for frontend (CSS, JS)
+# Files are kept in memory after the first read and sent with caching headers
 if FRONTEND_DIR.exists():
-    app.mount("/static", StaticFiles(directory=FRONTEND_DIR), name="static")
+    frontend_files = CachedStaticFiles(directory=FRONTEND_DIR)
+    app.mount("/static", frontend_files, name="static")
 
 
 # Serve frontend
 @app.get("/", tags=["Frontend"])
-async def serve_frontend():
+async def serve_frontend(request: Request):
     """Serve the frontend chat interface."""
     index_path = FRONTEND_DIR / "index.html"
-    if index_path.exists():
-        return FileResponse(index_path)
+    try:
+        stat_result = await asyncio.to_thread(index_path.stat)
+    except FileNotFoundError:
+        stat_result = None
+    if stat_result is not None:
+        return frontend_files.file_response(index_path, stat_result, request.scope)
     return {
         "name": settings.APP_NAME,
         "version": settings.APP_VERSION,
@@ -110,11 +149,15 @@ async def api_info():
 
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
     # In Azure App Service, the port is typically 80 or 8000
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=settings.DEBUG
+        reload=settings.DEBUG,
+        # uvloop is not available on Windows (see requirements.txt)
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools"
     )
@@ -0,0 +1,151 @@
+"""
+Shared pytest configuration for the AI Agent RAG Backend tests.
+Runs before any test module is imported, so the environment is set before settings load.
+"""
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+import orjson
+import pytest
+
+# Add the project root to the path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Set demo mode for testing
+os.environ.setdefault("DEMO_MODE", "true")
+os.environ.setdefault("DEBUG", "true")
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    """Run the async tests and fixtures on asyncio."""
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def client():
+    """Create one async client for the whole run so services are built once."""
+    # Imported here so unit tests don't pull in the full application
+    from main import app
+
+    async with app.router.lifespan_context(app):
+        # Let the startup warm-up finish so no test observes the "warming" state
+        await app.state.ready.wait()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as test_client:
+            yield test_client
+
+
+@pytest.fixture
+def reset_state():
+    """Clear conversation state, the only state API tests leave behind."""
+    from app.services.session_service import get_session_service
+
+    get_session_service().reset()
+    yield
+    get_session_service().reset()
+
+
+class FakeOpenAIService:
+    """
+    Azure OpenAI stand-in. The classifier calls search_documents with tool_query,
+    or answers directly when it is None. With stream_error, streams fail after one delta.
+    """
+
+    chat_deployment = "test"
+
+    def __init__(self, tool_query=None, stream_error=None):
+        self.tool_query = tool_query
+        self.stream_error = stream_error
+        self.calls = 0
+        self.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=self._create)))
+
+    async def _create(self, **kwargs):
+        self.calls += 1
+        tool_calls = None
+        if self.tool_query is not None:
+            arguments = orjson.dumps({"query": self.tool_query}).decode()
+            tool_calls = [SimpleNamespace(function=SimpleNamespace(name="search_documents", arguments=arguments))]
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(tool_calls=tool_calls))])
+
+    async def get_chat_completion(self, messages, **kwargs):
+        return "Answer"
+
+    async def stream_chat_completion(self, messages, **kwargs):
+        yield "Partial"
+        if self.stream_error is not None:
+            raise self.stream_error
+        yield " answer"
+
+    async def get_embeddings(self, texts):
+        return [[0.0] for _ in texts]
+
+    async def get_single_embedding(self, text):
+        return [0.0]
+
+
+class FakeRAGService:
+    """Records the queries retrieval is run with."""
+
+    def __init__(self):
+        self.queries = []
+
+    async def get_context_for_query(self, query):
+        self.queries.append(query)
+        return f"context for {query}", ["doc.txt"]
+
+
+class FakeSearchClient:
+    """In-memory stand-in for the Azure AI Search client."""
+
+    def __init__(self):
+        self.searches = []
+
+    def search(self, **kwargs):
+        self.searches.append(kwargs)
+        return iter([{"content": "Remote work is allowed.", "document_name": "policy.txt", "chunk_index": 0}])
+
+    def upload_documents(self, documents):
+        pass
+
+
+@pytest.fixture
+def make_agent():
+    """Build agents wired to fake services and a fresh session store."""
+    from app.services.agent_service import AgentService
+    from app.services.session_service import SessionService
+
+    def make(tool_query=None, stream_error=None, rag_service=None):
+        agent = AgentService.__new__(AgentService)
+        agent.openai_service = FakeOpenAIService(tool_query, stream_error)
+        agent.rag_service = rag_service or FakeRAGService()
+        agent.session_service = SessionService()
+        return agent
+
+    return make
+
+
+@pytest.fixture
+def make_rag_service(tmp_path, monkeypatch):
+    """Build real RAG services over one temporary documents directory, like uvicorn workers."""
+    import app.services.rag_service as rag_module
+    from app.core.config import settings
+
+    documents_path = tmp_path / "documents"
+    documents_path.mkdir()
+    (documents_path / "policy.txt").write_text("Remote work is allowed three days per week.")
+    monkeypatch.setattr(settings, "DOCUMENTS_PATH", str(documents_path))
+    monkeypatch.setattr(settings, "AZURE_SEARCH_SERVICE_ENDPOINT", "https://search.test")
+    monkeypatch.setattr(settings, "AZURE_SEARCH_ADMIN_KEY", "test-key")
+    monkeypatch.setattr(rag_module, "get_azure_openai_service", FakeOpenAIService)
+
+    def make(search_client=None):
+        rag = rag_module.RAGService()
+        rag.search_client = search_client or FakeSearchClient()
+        return rag
+
+    return make
@@ -0,0 +1,134 @@
+"""
+Unit tests for the Agent Service.
+Tests query routing between direct answers and document retrieval.
+"""
+import pytest
+import orjson
+
+import app.services.agent_service as agent_module
+from app.models.schemas import QueryType
+
+
+@pytest.fixture(autouse=True)
+def clear_classification_cache():
+    """Keep cached classifications from leaking between tests."""
+    agent_module._classification_cache.clear()
+    yield
+    agent_module._classification_cache.clear()
+
+
+@pytest.mark.anyio
+class TestRouteQuery:
+    """Tests for which query reaches the RAG service."""
+
+    async def test_rewritten_search_query_is_used(self, make_agent):
+        """Test that retrieval uses the classifier's rewritten search query."""
+        query = "Where do I find the rules about working from my house?"
+        agent = make_agent(tool_query="work from home guidelines")
+
+        query_type, context, sources = await agent._route_query(query, [])
+
+        assert query_type == QueryType.RAG
+        assert agent.rag_service.queries == ["work from home guidelines"]
+        assert context == "context for work from home guidelines"
+        assert sources == ["doc.txt"]
+
+    async def test_unchanged_query_is_retrieved_once(self, make_agent):
+        """Test that an unchanged search query is retrieved exactly once."""
+        query = "Where do I find the rules about working from my house?"
+        agent = make_agent(tool_query=query)
+
+        query_type, context, _ = await agent._route_query(query, [])
+
+        assert query_type == QueryType.RAG
+        assert agent.rag_service.queries == [query]
+        assert context == f"context for {query}"
+
+    async def test_direct_answer_skips_retrieval(self, make_agent):
+        """Test that a direct classification retrieves nothing."""
+        agent = make_agent(tool_query=None)
+
+        query_type, context, sources = await agent._route_query("What is the capital of France?", [])
+
+        assert query_type == QueryType.DIRECT
+        assert context == ""
+        assert sources == []
+        assert agent.rag_service.queries == []
+
+
+@pytest.mark.anyio
+class TestPreFilter:
+    """Tests for the checks that skip the classification call."""
+
+    @pytest.mark.parametrize("query", ["Hi", "hello!", "Thank you.", "  bye  "])
+    async def test_greeting_alone_is_answered_directly(self, query, make_agent):
+        """Test that a message made only of a greeting skips classification."""
+        agent = make_agent(tool_query=query)
+
+        query_type, search_query = await agent._classify_and_process_query(query, [])
+
+        assert query_type == QueryType.DIRECT
+        assert search_query is None
+        assert agent.openai_service.calls == 0
+
+    @pytest.mark.parametrize("query", [
+        "Hi, what is the remote work policy?",
+        "Thanks! How many vacation days do I get?",
+    ])
+    async def test_greeting_with_question_is_classified(self, query, make_agent):
+        """Test that a greeting followed by a question still goes to the classifier."""
+        agent = make_agent(tool_query=query)
+
+        query_type, _ = await agent._classify_and_process_query(query, [])
+
+        assert query_type == QueryType.RAG
+        assert agent.openai_service.calls == 1
+
+    async def test_company_keyword_uses_rag(self, make_agent):
+        """Test that a company-specific term routes to retrieval without classification."""
+        query = "How do I submit a reimbursement?"
+        agent = make_agent(tool_query=None)
+
+        query_type, search_query = await agent._classify_and_process_query(query, [])
+
+        assert query_type == QueryType.RAG
+        assert search_query == query
+        assert agent.openai_service.calls == 0
+
+    @pytest.mark.parametrize("query", [
+        "Should I leave my umbrella at home?",
+        "What does HR stand for in baseball?",
+        "How do I use a TV remote?",
+    ])
+    async def test_common_words_are_classified(self, query, make_agent):
+        """Test that everyday words no longer force retrieval."""
+        agent = make_agent(tool_query=None)
+
+        query_type, _ = await agent._classify_and_process_query(query, [])
+
+        assert query_type == QueryType.DIRECT
+        assert agent.openai_service.calls == 1
+
+
+@pytest.mark.anyio
+class TestProcessQueryStream:
+    """Tests for the streaming answer path."""
+
+    async def test_failure_ends_with_error_event_and_keeps_history(self, make_agent):
+        """Test that a failing stream sends an error event and still saves the exchange."""
+        agent = make_agent(stream_error=RuntimeError("connection reset"))
+
+        frames = [frame async for frame in agent.process_query_stream("Tell me a joke")]
+        events = [orjson.loads(frame[len("data: "):]) for frame in frames]
+
+        assert [event["type"] for event in events] == ["metadata", "delta", "error"]
+        assert "connection reset" in events[-1]["message"]
+        history = agent.session_service.get_conversation_history(events[0]["session_id"])
+        assert history == [
+            {"role": "user", "content": "Tell me a joke"},
+            {"role": "assistant", "content": "Partial"},
+        ]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -2,53 +2,63 @@
 Integration tests for the API endpoints.
 Tests all FastAPI routes and request/response handling.
 """
+import asyncio
 import pytest
-from fastapi.testclient import TestClient
+import subprocess
 import sys
+import threading
 from pathlib import Path
 
-# Add project root to path
-project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
-
+from app.services.agent_service import get_agent_service
 from main import app
 
 
-@pytest.fixture
-def client():
-    """Create test client."""
-    return TestClient(app)
+# Imports the app in a fresh interpreter and checks nothing heavy happened
+IMPORT_CHECK = """
+import sys
+import main
+from app.services import agent_service, azure_openai_service, rag_service, session_service
 
+getters = (
+    agent_service.get_agent_service,
+    azure_openai_service.get_azure_openai_service,
+    rag_service.get_rag_service,
+    session_service.get_session_service,
+)
+built = [getter.__name__ for getter in getters if getter.cache_info().currsize]
+assert not built, f"services built at import: {built}"
+loaded = {"torch", "transformers", "openai"} & set(sys.modules)
+assert not loaded, f"heavy modules imported: {loaded}"
+"""
 
-@pytest.fixture(autouse=True)
-def setup_test_environment():
-    """Set up test environment before each test."""
-    # Reset singletons
-    import app.services.session_service as session_module
-    import app.services.rag_service as rag_module
-    import app.services.agent_service as agent_module
-    import app.services.azure_openai_service as azure_module
-    
-    session_module._session_service = None
-    rag_module._rag_service = None
-    agent_module._agent_service = None
-    azure_module._azure_openai_service = None
-    
-    yield
-    
-    # Cleanup after test
-    session_module._session_service = None
-    rag_module._rag_service = None
-    agent_module._agent_service = None
-    azure_module._azure_openai_service = None
+# Requests that must be searching at the same time in the concurrency test
+CONCURRENT_SEARCHES = 8
+
+
+class BarrierSearchClient:
+    """
+    Blocking search client that returns only once CONCURRENT_SEARCHES searches are waiting.
+    If searches ran one at a time on the event loop, the first would time out the barrier.
+    """
+
+    def __init__(self):
+        self.barrier = threading.Barrier(CONCURRENT_SEARCHES, timeout=10)
+
+    def search(self, **kwargs):
+        self.barrier.wait()
+        return iter([{"content": "PTO accrues monthly.", "document_name": "hr_policies.txt", "chunk_index": 0}])
+
+
+# Every test here is async and starts with an empty session store
+pytestmark = [pytest.mark.anyio, pytest.mark.usefixtures("reset_state")]
 
 
 class TestHealthEndpoint:
     """Tests for the health check endpoint."""
     
-    def test_health_check(self, client):
+    async def test_health_check(self, client):
         """Test health check returns healthy status."""
-        response = client.get("/api/v1/health")
+        response = await client.get("/api/v1/health")
         
         assert response.status_code == 200
         data = response.json()
@@ -56,19 +66,33 @@ class TestHealthEndpoint:
         assert data["version"] == "1.0.0"
         assert "timestamp" in data
     
-    def test_health_check_content_type(self, client):
+    async def test_health_check_content_type(self, client):
         """Test health check returns JSON content."""
-        response = client.get("/api/v1/health")
+        response = await client.get("/api/v1/health")
         
         assert response.headers["content-type"] == "application/json"
 
+    async def test_health_check_warming(self, client):
+        """Test health check reports warming until services are ready."""
+        ready = app.state.ready
+        app.state.ready = asyncio.Event()
+        try:
+            response = await client.get("/api/v1/health")
+            assert response.json()["status"] == "warming"
+
+            app.state.ready.set()
+            response = await client.get("/api/v1/health")
+            assert response.json()["status"] == "healthy"
+        finally:
+            app.state.ready = ready
+
 
 class TestRootEndpoint:
     """Tests for the root endpoint."""
     
-    def test_api_info(self, client):
+    async def test_api_info(self, client):
         """Test API info endpoint."""
-        response = client.get("/api")
+        response = await client.get("/api")
         
         assert response.status_code == 200
         data = response.json()
@@ -81,9 +105,9 @@ class TestRootEndpoint:
 class TestAskEndpoint:
     """Tests for the main /ask endpoint."""
     
-    def test_ask_with_valid_query(self, client):
+    async def test_ask_with_valid_query(self, client):
         """Test asking a question about company policies."""
-        response = client.post(
+        response = await client.post(
             "/api/v1/ask",
             json={"query": "What is the remote work policy?"}
         )
@@ -99,10 +123,10 @@ class TestAskEndpoint:
         # Should use RAG for policy questions
         assert data["query_type"] in ["rag", "direct"]
     
-    def test_ask_with_session_id_new(self, client):
+    async def test_ask_with_session_id_new(self, client):
         """Test asking with a new session ID creates session."""
         session_id = "test-session-123"
-        response = client.post(
+        response = await client.post(
             "/api/v1/ask",
             json={
                 "query": "What is the PTO policy?",
@@ -116,10 +140,10 @@ class TestAskEndpoint:
         assert data["session_id"] is not None
         assert len(data["session_id"]) > 0
     
-    def test_ask_maintains_conversation(self, client):
+    async def test_ask_maintains_conversation(self, client):
         """Test that conversation history is maintained."""
         # First message - will create a session
-        response1 = client.post(
+        response1 = await client.post(
             "/api/v1/ask",
             json={"query": "What is the remote work policy?"}
         )
@@ -128,7 +152,7 @@ class TestAskEndpoint:
         session_id = response1.json()["session_id"]
         
         # Second message in same session
-        response2 = client.post(
+        response2 = await client.post(
             "/api/v1/ask",
             json={
                 "query": "How many days can I work remotely?",
@@ -140,27 +164,57 @@ class TestAskEndpoint:
         # Both should use same session
         assert response1.json()["session_id"] == response2.json()["session_id"] == session_id
     
-    def test_ask_with_empty_query(self, client):
+    async def test_ask_response_field_types(self, client):
+        """Test that the response fields have the expected types."""
+        response = await client.post(
+            "/api/v1/ask",
+            json={"query": "What is the PTO policy?"}
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert isinstance(data["answer"], str)
+        assert isinstance(data["sources"], list)
+        assert all(isinstance(source, str) for source in data["sources"])
+        assert data["query_type"] in ["rag", "direct"]
+        assert isinstance(data["session_id"], str)
+        assert isinstance(data["timestamp"], str)
+    
+    async def test_ask_stream(self, client):
+        """Test the streaming endpoint returns SSE frames."""
+        response = await client.post(
+            "/api/v1/ask/stream",
+            json={"query": "What is the remote work policy?"}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        frames = [line for line in response.text.split("\n\n") if line]
+        assert all(frame.startswith("data: ") for frame in frames)
+        assert '"type":"metadata"' in frames[0]
+        assert '"type":"done"' in frames[-1]
+
+    async def test_ask_with_empty_query(self, client):
         """Test asking with empty query returns error."""
-        response = client.post(
+        response = await client.post(
             "/api/v1/ask",
             json={"query": ""}
         )
         
         assert response.status_code == 422  # Validation error
     
-    def test_ask_with_missing_query(self, client):
+    async def test_ask_with_missing_query(self, client):
         """Test asking without query parameter."""
-        response = client.post(
+        response = await client.post(
             "/api/v1/ask",
             json={}
         )
         
         assert response.status_code == 422  # Validation error
     
-    def test_ask_with_general_knowledge_question(self, client):
+    async def test_ask_with_general_knowledge_question(self, client):
         """Test asking a general knowledge question."""
-        response = client.post(
+        response = await client.post(
             "/api/v1/ask",
             json={"query": "What is the capital of France?"}
         )
@@ -169,9 +223,9 @@ class TestAskEndpoint:
         data = response.json()
         assert len(data["answer"]) > 0
     
-    def test_ask_with_product_question(self, client):
+    async def test_ask_with_product_question(self, client):
         """Test asking about products."""
-        response = client.post(
+        response = await client.post(
             "/api/v1/ask",
             json={"query": "What are the features of CloudSync Pro?"}
         )
@@ -180,13 +234,31 @@ class TestAskEndpoint:
         data = response.json()
         assert len(data["answer"]) > 0
 
+    async def test_concurrent_asks_are_not_serialized(self, client, make_agent, make_rag_service):
+        """Test that concurrent requests search in parallel instead of blocking the event loop."""
+        search_client = BarrierSearchClient()
+        agent = make_agent(rag_service=make_rag_service(search_client))
+        app.dependency_overrides[get_agent_service] = lambda: agent
+        try:
+            # PTO questions skip classification and each runs its own search
+            responses = await asyncio.gather(*(
+                client.post("/api/v1/ask", json={"query": f"How much PTO do I get in year {i}?"})
+                for i in range(CONCURRENT_SEARCHES)
+            ))
+        finally:
+            app.dependency_overrides.pop(get_agent_service, None)
+
+        assert all(response.status_code == 200 for response in responses)
+        assert not search_client.barrier.broken
+        assert all(response.json()["query_type"] == "rag" for response in responses)
+
 
 class TestReindexEndpoint:
     """Tests for the document reindexing endpoint."""
     
-    def test_reindex_documents(self, client):
+    async def test_reindex_documents(self, client):
         """Test re-indexing all documents."""
-        response = client.post("/api/v1/reindex")
+        response = await client.post("/api/v1/reindex")
         
         assert response.status_code == 200
         data = response.json()
@@ -198,9 +270,9 @@ class TestReindexEndpoint:
 class TestSessionEndpoint:
     """Tests for session management endpoints."""
     
-    def test_create_session(self, client):
+    async def test_create_session(self, client):
         """Test that asking a question creates a session."""
-        response = client.post(
+        response = await client.post(
             "/api/v1/ask",
             json={"query": "Test question"}
         )
@@ -210,25 +282,25 @@ class TestSessionEndpoint:
         assert data["session_id"] is not None
         assert len(data["session_id"]) > 0
     
-    def test_clear_session(self, client):
+    async def test_clear_session(self, client):
         """Test clearing a session."""
         # First create a session
-        response = client.post(
+        response = await client.post(
             "/api/v1/ask",
             json={"query": "Test question"}
         )
         session_id = response.json()["session_id"]
         
         # Clear the session
-        clear_response = client.delete(f"/api/v1/session/{session_id}")
+        clear_response = await client.delete(f"/api/v1/session/{session_id}")
         
         assert clear_response.status_code == 200
         data = clear_response.json()
         assert f"Session {session_id} cleared successfully" in data["message"]
     
-    def test_clear_nonexistent_session(self, client):
+    async def test_clear_nonexistent_session(self, client):
         """Test clearing a non-existent session returns 404."""
-        response = client.delete("/api/v1/session/nonexistent-session-id")
+        response = await client.delete("/api/v1/session/nonexistent-session-id")
         
         assert response.status_code == 404
 
@@ -236,14 +308,29 @@ class TestSessionEndpoint:
 class TestFrontendEndpoints:
     """Tests for frontend-related endpoints."""
     
-    def test_frontend_served(self, client):
+    async def test_frontend_served(self, client):
         """Test frontend index is served."""
-        response = client.get("/")
+        response = await client.get("/")
         
         # Should return either frontend HTML or API info
         assert response.status_code == 200
 
 
+class TestImportSideEffects:
+    """Tests that importing the application stays cheap."""
+
+    def test_no_services_built_on_import(self):
+        """Test that importing main constructs no service and loads no model library."""
+        result = subprocess.run(
+            [sys.executable, "-c", IMPORT_CHECK],
+            cwd=Path(__file__).parent.parent,
+            capture_output=True,
+            text=True
+        )
+
+        assert result.returncode == 0, result.stderr
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
 
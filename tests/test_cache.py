@@ -0,0 +1,67 @@
+"""
+Unit tests for the shared LRU cache.
+"""
+import pytest
+
+from app.core.cache import LRUCache
+
+
+class TestLRUCache:
+    """Tests for LRUCache."""
+    
+    def test_get_and_put(self):
+        """Test storing and retrieving a value."""
+        cache = LRUCache(maxsize=2)
+        cache.put("a", [1.0])
+        
+        assert cache.get("a") == [1.0]
+        assert cache.get("missing") is None
+        assert cache.hits == 1
+        assert cache.misses == 1
+    
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used entry is evicted."""
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        
+        # Touch "a" so "b" becomes least recently used
+        cache.get("a")
+        cache.put("c", 3)
+        
+        assert "a" in cache
+        assert "b" not in cache
+        assert "c" in cache
+        assert len(cache) == 2
+    
+    def test_clear(self):
+        """Test clearing entries and counters."""
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.get("a")
+        cache.clear()
+        
+        assert len(cache) == 0
+        assert cache.hits == 0
+        assert cache.misses == 0
+
+    
+    def test_entries_expire_after_ttl(self, monkeypatch):
+        """Test that entries older than the ttl are treated as misses."""
+        import app.core.cache as cache_module
+        now = [100.0]
+        monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+        cache = LRUCache(maxsize=2, ttl=10)
+        cache.put("a", 1)
+        
+        now[0] += 9
+        assert cache.get("a") == 1
+        
+        now[0] += 1
+        assert cache.get("a") is None
+        assert "a" not in cache
+        assert len(cache) == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,70 @@
+"""
+Unit tests for the read-ahead helper.
+"""
+import asyncio
+import pytest
+import threading
+
+from app.core.prefetch import prefetch
+
+
+async def collect(func, items, window):
+    """Await every prefetched result, returning (item, result or exception) pairs."""
+    results = []
+    async for item, future in prefetch(func, items, window):
+        try:
+            results.append((item, await future))
+        except Exception as e:
+            results.append((item, e))
+    return results
+
+
+class TestPrefetch:
+    """Tests for prefetch."""
+
+    def test_preserves_order(self):
+        """Test that results are yielded in input order."""
+        results = asyncio.run(collect(lambda x: x * 2, range(20), window=3))
+
+        assert results == [(i, i * 2) for i in range(20)]
+
+    def test_runs_ahead_of_consumer(self):
+        """Test that later items start before earlier ones are consumed."""
+        started = []
+        gate = threading.Event()
+
+        def work(x):
+            started.append(x)
+            if x == 0:
+                gate.wait(timeout=5)
+            return x
+
+        async def run():
+            async for item, future in prefetch(work, range(4), window=3):
+                if item == 0:
+                    # Item 0 blocks until the items behind it are already running
+                    while len(started) < 3:
+                        await asyncio.sleep(0.01)
+                    gate.set()
+                await future
+
+        asyncio.run(run())
+
+        assert sorted(started[:3]) == [0, 1, 2]
+
+    def test_exception_is_raised_on_await(self):
+        """Test that a failing item surfaces its exception without stopping the rest."""
+        def work(x):
+            if x == 1:
+                raise ValueError("bad item")
+            return x
+
+        results = asyncio.run(collect(work, range(3), window=2))
+
+        assert results[0] == (0, 0)
+        assert isinstance(results[1][1], ValueError)
+        assert results[2] == (2, 2)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -3,13 +3,8 @@ Unit tests for the RAG Service.
 Tests document processing, indexing, and search functionality.
 """
 import pytest
-import sys
-from pathlib import Path
-
-# Add project root to path
-project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
 
+import app.core.cache as cache_module
 from app.services.rag_service import RAGService, DocumentChunk, get_rag_service
 from app.core.config import settings
 
@@ -51,10 +46,10 @@ class TestRAGService:
         settings.DEMO_MODE = True
         # Reset singleton for each test
         import app.services.rag_service as rag_module
-        rag_module._rag_service = None
+        rag_module.get_rag_service.cache_clear()
         yield
         # Cleanup
-        rag_module._rag_service = None
+        rag_module.get_rag_service.cache_clear()
     
     def test_rag_service_initialization(self):
         """Test RAG service initializes correctly."""
@@ -77,7 +72,7 @@ class TestRAGService:
         rag = RAGService()
         
         text = "This is a test. " * 100  # Create long text
-        chunks = rag._chunk_text(text, chunk_size=100, overlap=10)
+        chunks = list(rag._chunk_text(text, chunk_size=100, overlap=10))
         
         assert len(chunks) > 1
         for chunk in chunks:
@@ -89,7 +84,7 @@ class TestRAGService:
         rag = RAGService()
         
         text = "Short text."
-        chunks = rag._chunk_text(text)
+        chunks = list(rag._chunk_text(text))
         
         assert len(chunks) == 1
         assert chunks[0] == "Short text."
@@ -157,9 +152,9 @@ class TestRAGServiceIntegration:
         """Set up test environment."""
         settings.DEMO_MODE = True
         import app.services.rag_service as rag_module
-        rag_module._rag_service = None
+        rag_module.get_rag_service.cache_clear()
         yield
-        rag_module._rag_service = None
+        rag_module.get_rag_service.cache_clear()
     
     def test_index_documents(self):
         """Test indexing documents from the documents directory."""
@@ -209,6 +204,72 @@ class TestRAGServiceIntegration:
         assert len(results) <= 5
 
 
+@pytest.mark.anyio
+class TestSearchCache:
+    """Tests for when cached search results are served."""
+
+    async def test_reindex_clears_cached_results(self, make_rag_service):
+        """Test that a reindex in the same worker stops it serving cached results."""
+        rag = make_rag_service()
+        await rag.index_documents()
+
+        await rag.search("remote work")
+        await rag.search("Remote  work")
+        assert len(rag.search_client.searches) == 1
+
+        await rag.index_documents()
+        await rag.search("remote work")
+        assert len(rag.search_client.searches) == 2
+
+    async def test_cached_results_expire_after_ttl(self, make_rag_service, monkeypatch):
+        """Test that results cached before another worker's reindex expire."""
+        worker = make_rag_service()
+        await worker.search("remote work")
+
+        # Step the clock past the TTL, as if another worker reindexed meanwhile
+        real_monotonic = cache_module.time.monotonic
+        monkeypatch.setattr(
+            cache_module.time, "monotonic",
+            lambda: real_monotonic() + settings.SEARCH_CACHE_TTL_SECONDS + 1
+        )
+        await worker.search("remote work")
+
+        assert len(worker.search_client.searches) == 2
+
+
+class TestChunkBoundaries:
+    """Tests pinning where _chunk_text breaks; changing them requires a reindex."""
+
+    def test_breaks_after_last_boundary_of_any_kind(self):
+        """Test that a later sentence end wins over an earlier paragraph break."""
+        rag = RAGService.__new__(RAGService)
+        text = (
+            "Remote work needs manager approval first.\n\n"
+            "Ask early. Equipment ships within five business days of approval."
+        )
+
+        chunks = list(rag._chunk_text(text, chunk_size=60, overlap=10))
+
+        assert chunks == [
+            "Remote work needs manager approval first.\n\nAsk early.",
+            "sk early. Equipment ships within five business days of appro",
+            "s of approval.",
+        ]
+
+    def test_boundary_before_halfway_is_ignored(self):
+        """Test that the window is cut at chunk_size when its only boundary is too early."""
+        rag = RAGService.__new__(RAGService)
+        text = "Hi. Then one long sentence that keeps going without any stop at all until here."
+
+        chunks = list(rag._chunk_text(text, chunk_size=40, overlap=5))
+
+        assert chunks == [
+            "Hi. Then one long sentence that keeps go",
+            "ps going without any stop at all until h",
+            "til here.",
+        ]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
 
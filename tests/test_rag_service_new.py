@@ -0,0 +1,44 @@
+"""
+Unit tests for the alternative RAG Service in rag_service_new.
+Tests document chunking, whose output decides the indexed content.
+"""
+import pytest
+
+from app.services.rag_service_new import RAGService
+
+
+class TestChunkBoundaries:
+    """Tests pinning where _chunk_text breaks; changing them requires a reindex."""
+
+    def test_breaks_after_last_boundary_of_any_kind(self):
+        """Test that a later sentence end wins over an earlier paragraph break."""
+        rag = RAGService.__new__(RAGService)
+        text = (
+            "Remote work needs manager approval first.\n\n"
+            "Ask early. Equipment ships within five business days of approval."
+        )
+
+        chunks = rag._chunk_text(text, chunk_size=60, overlap=10)
+
+        assert chunks == [
+            "Remote work needs manager approval first.\n\nAsk early.",
+            "sk early. Equipment ships within five business days of appro",
+            "s of approval.",
+        ]
+
+    def test_boundary_before_halfway_is_ignored(self):
+        """Test that the window is cut at chunk_size when its only boundary is too early."""
+        rag = RAGService.__new__(RAGService)
+        text = "Hi. Then one long sentence that keeps going without any stop at all until here."
+
+        chunks = rag._chunk_text(text, chunk_size=40, overlap=5)
+
+        assert chunks == [
+            "Hi. Then one long sentence that keeps go",
+            "ps going without any stop at all until h",
+            "til here.",
+        ]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -3,12 +3,7 @@ Unit tests for the Session Service.
 Tests session management and conversation history functionality.
 """
 import pytest
-import sys
-from pathlib import Path
-
-# Add project root to path
-project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
+from datetime import timedelta
 
 from app.services.session_service import SessionService, get_session_service
 from app.models.schemas import SessionData, SessionMessage
@@ -22,10 +17,10 @@ class TestSessionService:
         """Set up test environment."""
         # Reset singleton for each test
         import app.services.session_service as session_module
-        session_module._session_service = None
+        session_module.get_session_service.cache_clear()
         yield
         # Cleanup
-        session_module._session_service = None
+        session_module.get_session_service.cache_clear()
     
     def test_session_service_initialization(self):
         """Test session service initializes correctly."""
@@ -127,6 +122,21 @@ class TestSessionService:
         assert history[2]["role"] == "user"
         assert history[2]["content"] == "Second question?"
     
+    def test_get_recent(self):
+        """Test getting the most recent messages."""
+        service = get_session_service()
+
+        session_id = service.get_or_create_session(None)
+
+        for i in range(5):
+            service.add_message(session_id, "user", f"Message {i}")
+
+        recent = service.get_recent(session_id, 2)
+
+        assert [msg["content"] for msg in recent] == ["Message 3", "Message 4"]
+        assert len(service.get_recent(session_id, 10)) == 5
+        assert service.get_recent("nonexistent-session-id", 2) == []
+
     def test_get_history_nonexistent_session(self):
         """Test getting history for non-existent session."""
         service = get_session_service()
@@ -159,6 +169,19 @@ class TestSessionService:
         
         assert result is False
     
+    def test_reset(self):
+        """Test that reset removes every session."""
+        service = get_session_service()
+        
+        first = service.get_or_create_session(None)
+        second = service.get_or_create_session(None)
+        
+        service.reset()
+        
+        assert first not in service._sessions
+        assert second not in service._sessions
+        assert service.get_conversation_history(first) == []
+    
     def test_add_message_to_nonexistent_session(self):
         """Test adding message to non-existent session."""
         service = get_session_service()
@@ -181,6 +204,49 @@ class TestSessionService:
         # Should be limited to max_history * 2
         assert len(session_data.messages) <= 20
 
+    def test_session_round_trips_through_json(self):
+        """Test that a stored session serializes and validates back with its history."""
+        service = get_session_service()
+        session_id = service.get_or_create_session(None)
+        service.add_message(session_id, "user", "Hello")
+        service.add_message(session_id, "assistant", "Hi there!")
+        
+        session_data = service._sessions[session_id]
+        restored = SessionData.model_validate_json(session_data.model_dump_json())
+        
+        assert restored.session_id == session_id
+        assert [msg.content for msg in restored.messages] == ["Hello", "Hi there!"]
+
+    def test_least_recently_used_session_evicted(self):
+        """Test that creating a session beyond the cap evicts the least recently used one."""
+        service = get_session_service()
+        service._max_sessions = 2
+        
+        first = service.get_or_create_session(None)
+        second = service.get_or_create_session(None)
+        # Using the first session makes the second the least recently used
+        service.add_message(first, "user", "Still here")
+        third = service.get_or_create_session(None)
+        
+        assert first in service._sessions
+        assert second not in service._sessions
+        assert third in service._sessions
+
+    def test_expired_sessions_cleaned_up(self):
+        """Test that expired sessions are swept once the cleanup interval passes."""
+        service = get_session_service()
+
+        session_id = service.get_or_create_session(None)
+        service._sessions[session_id].last_accessed -= timedelta(minutes=service._timeout_minutes + 1)
+
+        # Not swept before the interval elapses
+        service.get_or_create_session(None)
+        assert session_id in service._sessions
+
+        service._next_cleanup = 0
+        service.get_or_create_session(None)
+        assert session_id not in service._sessions
+
 
 class TestSessionData:
     """Tests for SessionData model."""
@@ -193,7 +259,7 @@ class TestSessionData:
         )
         
         assert session.session_id == "test-session"
-        assert session.messages == []
+        assert list(session.messages) == []
         assert session.created_at is not None
         assert session.last_accessed is not None
     
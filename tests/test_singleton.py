@@ -0,0 +1,55 @@
+"""
+Unit tests for the thread-safe singleton decorator.
+"""
+import pytest
+import threading
+import time
+
+from app.core.singleton import singleton
+
+
+class TestSingleton:
+    """Tests for singleton."""
+
+    def test_returns_same_instance(self):
+        """Test that repeated calls return one instance."""
+        @singleton
+        def get_service():
+            return object()
+
+        assert get_service() is get_service()
+
+    def test_concurrent_first_calls_construct_once(self):
+        """Test that racing first calls run the factory only once."""
+        calls = []
+
+        @singleton
+        def get_service():
+            calls.append(1)
+            time.sleep(0.05)
+            return object()
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(get_service())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert all(result is results[0] for result in results)
+
+    def test_cache_clear(self):
+        """Test that cache_clear forces a new instance."""
+        @singleton
+        def get_service():
+            return object()
+
+        first = get_service()
+        get_service.cache_clear()
+
+        assert get_service() is not first
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
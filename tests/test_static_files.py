@@ -0,0 +1,140 @@
+"""
+Unit tests for cached static file serving.
+"""
+import asyncio
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from app.core.static_files import (
+    _file_cache,
+    CachedStaticFiles,
+    IMMUTABLE_CACHE_CONTROL,
+    REVALIDATE_CACHE_CONTROL,
+)
+
+
+def get(directory, path, headers=None):
+    """Request a file from a CachedStaticFiles mount."""
+    app = Starlette(routes=[Mount("/static", CachedStaticFiles(directory=directory))])
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(f"/static/{path}", headers=headers)
+
+    return asyncio.run(run())
+
+
+class TestCachedStaticFiles:
+    """Tests for CachedStaticFiles."""
+
+    def test_serves_file_with_validators(self, tmp_path):
+        """Test that files are served with ETag, Last-Modified and Cache-Control."""
+        (tmp_path / "app.js").write_text("console.log(1);")
+
+        response = get(tmp_path, "app.js")
+
+        assert response.status_code == 200
+        assert response.text == "console.log(1);"
+        assert "javascript" in response.headers["content-type"]
+        assert response.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+        assert "etag" in response.headers
+        assert "last-modified" in response.headers
+
+    def test_hashed_file_is_immutable(self, tmp_path):
+        """Test that content-hashed file names get a long immutable lifetime."""
+        (tmp_path / "app.3f2a9c1b.js").write_text("x")
+
+        response = get(tmp_path, "app.3f2a9c1b.js")
+
+        assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+
+    def test_matching_etag_returns_not_modified(self, tmp_path):
+        """Test that a conditional request with the current ETag gets an empty 304."""
+        (tmp_path / "styles.css").write_text("body {}")
+        etag = get(tmp_path, "styles.css").headers["etag"]
+
+        response = get(tmp_path, "styles.css", headers={"if-none-match": etag})
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+
+    def test_edited_file_is_reread(self, tmp_path):
+        """Test that changing a file invalidates its cached contents."""
+        path = tmp_path / "index.html"
+        path.write_text("old")
+        get(tmp_path, "index.html")
+
+        path.write_text("new contents")
+
+        assert get(tmp_path, "index.html").text == "new contents"
+
+    def test_text_file_served_precompressed(self, tmp_path):
+        """Test that text files are gzip-encoded for clients that accept it."""
+        content = "<p>Hello, world!</p>\n" * 200
+        (tmp_path / "index.html").write_text(content)
+
+        response = get(tmp_path, "index.html", headers={"accept-encoding": "gzip"})
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert int(response.headers["content-length"]) < len(content)
+        assert response.text == content
+
+    def test_identity_when_encoding_not_accepted(self, tmp_path):
+        """Test that clients refusing compression get the raw file."""
+        content = "<p>Hello, world!</p>\n" * 200
+        (tmp_path / "index.html").write_text(content)
+
+        response = get(tmp_path, "index.html", headers={"accept-encoding": "gzip;q=0, identity"})
+
+        assert "content-encoding" not in response.headers
+        assert response.text == content
+
+    def test_encodings_have_distinct_etags(self, tmp_path):
+        """Test that compressed and raw representations are validated separately."""
+        (tmp_path / "index.html").write_text("<p>Hello, world!</p>\n" * 200)
+        gzip_etag = get(tmp_path, "index.html", headers={"accept-encoding": "gzip"}).headers["etag"]
+
+        response = get(tmp_path, "index.html", headers={
+            "accept-encoding": "identity",
+            "if-none-match": gzip_etag,
+        })
+
+        assert response.status_code == 200
+        assert response.headers["etag"] != gzip_etag
+
+    def test_preload_serves_first_request_from_cache(self, tmp_path):
+        """Test that preloaded files are not read again on their first request."""
+        (tmp_path / "index.html").write_text("<html></html>")
+        (tmp_path / "css").mkdir()
+        (tmp_path / "css" / "styles.css").write_text("body {}")
+        _file_cache.clear()
+
+        assert CachedStaticFiles(directory=tmp_path).preload() == 2
+        response = get(tmp_path, "css/styles.css")
+
+        assert response.text == "body {}"
+        assert _file_cache.misses == 2
+        assert _file_cache.hits == 1
+
+    def test_uncached_file_is_not_read_on_response_creation(self, tmp_path):
+        """Test that a cache miss defers reading the file until the response is sent."""
+        path = tmp_path / "app.js"
+        path.write_text("console.log(1);")
+        _file_cache.clear()
+
+        files = CachedStaticFiles(directory=tmp_path)
+        files.file_response(str(path), path.stat(), {"type": "http", "headers": []})
+
+        assert len(_file_cache) == 0
+        response = get(tmp_path, "app.js")
+        assert response.text == "console.log(1);"
+        assert len(_file_cache) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])